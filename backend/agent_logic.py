@@ -1,16 +1,40 @@
 """Agent logic for handling user queries and managing conversations."""
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+import re
+from typing import Optional, List, Dict, Any, Iterator
 from datetime import datetime
 
+from backend.config import config
 from backend.database import db
+from backend.semantic_cache import SemanticCache
 from backend.unified_llm_service import unified_llm_service
-from backend.models import Email, Draft, AgentMessage
+from backend.models import Email, EmailHeader, Draft, AgentMessage
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+try:
+    from rapidfuzz import fuzz, process as fuzzy_process
+except ImportError:  # pragma: no cover - rapidfuzz is optional
+    fuzzy_process = None
+
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+# Keywords marking a query as inbox-wide, compiled into one alternation
+INBOX_KEYWORDS = [
+    "show", "list", "urgent", "important", "all",
+    "how many", "what", "tasks", "emails from"
+]
+_INBOX_QUERY_PATTERN = re.compile("|".join(map(re.escape, INBOX_KEYWORDS)), re.IGNORECASE)
+
+SUMMARY_QUERY = "Please provide a concise summary of this email in 2-3 sentences."
+CONVERSATION_SUMMARY_QUERY = (
+    "Summarize the conversation above in a few sentences, keeping any facts, "
+    "decisions and open questions the assistant may need later."
+)
+
+# Minimum rapidfuzz score (0-100) for a subject to count as a fuzzy search match
+FUZZY_SEARCH_CUTOFF = 75
+
 
 class EmailAgent:
     """Intelligent email agent for handling user queries."""
@@ -19,13 +43,14 @@ class EmailAgent:
         """Initialize agent."""
         self.db = db
         self.llm = unified_llm_service
-        self.conversation_history: List[Dict[str, str]] = []
+        self.response_cache = SemanticCache(self.db) if config.SEMANTIC_CACHE_ENABLED else None
     
     def handle_query(
         self,
         user_query: str,
         selected_email_id: Optional[int] = None,
-        conversation_history: List[AgentMessage] = None
+        conversation_history: List[AgentMessage] = None,
+        conversation_summary: Optional[str] = None
     ) -> str:
         """
         Handle user query with context awareness.
@@ -34,19 +59,57 @@ class EmailAgent:
             user_query: User's question or request
             selected_email_id: Currently selected email ID for context
             conversation_history: Previous conversation messages
+            conversation_summary: Summary of turns older than conversation_history
             
         Returns:
             Agent response text
         """
-        logger.info(f"Handling query: {user_query[:50]}...")
+        return "".join(self.handle_query_stream(
+            user_query, selected_email_id, conversation_history, conversation_summary
+        ))
+    
+    def handle_query_stream(
+        self,
+        user_query: str,
+        selected_email_id: Optional[int] = None,
+        conversation_history: List[AgentMessage] = None,
+        conversation_summary: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Handle user query with context awareness, yielding the response as it is generated.
         
-        # Build conversation history for LLM
+        Args:
+            user_query: User's question or request
+            selected_email_id: Currently selected email ID for context
+            conversation_history: Previous conversation messages
+            conversation_summary: Summary of turns older than conversation_history
+            
+        Yields:
+            Response text chunks
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Handling query: %s...", user_query[:50])
+        
+        # The cache key is only (query, email): follow-ups depend on the conversation,
+        # and inbox-wide answers go stale as soon as emails are processed
+        cacheable = selected_email_id is not None and not conversation_history and not conversation_summary
+        if cacheable:
+            cached = self._get_cached_response(user_query, selected_email_id)
+            if cached:
+                yield cached
+                return
+        
+        # Build conversation history for LLM (the summary takes one slot of the window)
         messages = []
-        if conversation_history:
-            messages = [
+        history_limit = config.MAX_CONVERSATION_HISTORY
+        if conversation_summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {conversation_summary}"})
+            history_limit -= 1
+        if conversation_history and history_limit > 0:
+            messages.extend(
                 {"role": msg.role, "content": msg.content}
-                for msg in conversation_history[-5:]  # Last 5 messages
-            ]
+                for msg in conversation_history[-history_limit:]
+            )
         
         # Determine query type and gather context
         email_context = None
@@ -61,17 +124,22 @@ class EmailAgent:
         elif self._is_inbox_query(user_query):
             email_context = self._build_inbox_context(user_query)
         
-        # Call LLM with context
-        response = self.llm.answer_query(
+        # Stream LLM response with context
+        chunks = []
+        for chunk in self.llm.answer_query_stream(
             query=user_query,
             email_context=email_context,
             conversation_history=messages
-        )
+        ):
+            chunks.append(chunk)
+            yield chunk
         
+        response = "".join(chunks)
         if response:
-            return response
+            if cacheable:
+                self._cache_response(user_query, selected_email_id, response)
         else:
-            return "I apologize, but I'm having trouble processing your request. Please try again."
+            yield "I apologize, but I'm having trouble processing your request. Please try again."
     
     def generate_draft(
         self,
@@ -115,10 +183,73 @@ class EmailAgent:
             logger.error("Failed to generate reply")
             return None
         
-        # Create draft object
+        return self._save_draft(email, reply_body, user_instruction)
+    
+    def generate_drafts(
+        self,
+        email_ids: List[int],
+        user_instruction: Optional[str] = None
+    ) -> List[Draft]:
+        """
+        Generate draft replies for several emails in one batched LLM submission.
+        
+        Args:
+            email_ids: Emails to reply to
+            user_instruction: Optional instructions applied to every draft
+            
+        Returns:
+            Drafts that were generated and saved successfully
+        """
+        emails = self.db.get_emails_by_ids(email_ids)
+        if not emails:
+            return []
+        
+        prompt_obj = self.db.get_prompt("auto_reply")
+        if not prompt_obj:
+            logger.error("Auto-reply prompt not found")
+            return []
+        
+        reply_bodies = self.llm.generate_replies_batch(
+            email_contents=[
+                f"From: {email.sender}\nSubject: {email.subject}\n\n{email.body}"
+                for email in emails
+            ],
+            contexts=[f"Category: {email.category}" for email in emails],
+            reply_prompt=prompt_obj.prompt_text,
+            user_instruction=user_instruction
+        )
+        
+        drafts = []
+        for email, reply_body in zip(emails, reply_bodies):
+            if not reply_body:
+                logger.error(f"Failed to generate reply for email {email.id}")
+                continue
+            draft = self._save_draft(email, reply_body, user_instruction)
+            if draft:
+                drafts.append(draft)
+        
+        return drafts
+    
+    def _save_draft(
+        self,
+        email: Email,
+        reply_body: str,
+        user_instruction: Optional[str] = None
+    ) -> Optional[Draft]:
+        """
+        Build a draft reply for an email and persist it.
+        
+        Args:
+            email: Email being replied to
+            reply_body: Generated reply text
+            user_instruction: Instructions used for generation
+            
+        Returns:
+            Saved Draft object or None on failure
+        """
         draft = Draft(
             id=None,
-            email_id=email_id,
+            email_id=email.id,
             subject=f"Re: {email.subject}",
             body=reply_body,
             metadata={
@@ -134,7 +265,7 @@ class EmailAgent:
         # Save draft to database
         try:
             draft.id = self.db.insert_draft(draft)
-            logger.info(f"Created draft {draft.id} for email {email_id}")
+            logger.info("Created draft %s for email %s", draft.id, email.id)
             return draft
         except Exception as e:
             logger.error(f"Failed to save draft: {e}")
@@ -150,14 +281,111 @@ class EmailAgent:
         Returns:
             Summary text
         """
+        query = SUMMARY_QUERY
+        cached = self._get_cached_response(query, email_id)
+        if cached:
+            return cached
+        
         email = self.db.get_email(email_id)
         if not email:
             return "Email not found."
         
-        query = f"Please provide a concise summary of this email in 2-3 sentences."
         email_context = self._build_email_context(email)
         
         response = self.llm.answer_query(query=query, email_context=email_context)
+        if response:
+            self._cache_response(query, email_id, response)
+        return response or "Unable to generate summary."
+    
+    def summarize_conversation(
+        self,
+        conversation_history: List[AgentMessage],
+        previous_summary: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Condense chat turns that no longer fit the history window into a short summary.
+        
+        Args:
+            conversation_history: Messages to summarize, oldest first
+            previous_summary: Summary of the turns before these, folded into the new one
+            
+        Returns:
+            Summary text or None on failure
+        """
+        transcript = "\n".join(
+            f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}"
+            for msg in conversation_history
+        )
+        if previous_summary:
+            transcript = f"Summary of the conversation before this: {previous_summary}\n{transcript}"
+        
+        return self.llm.answer_query(query=CONVERSATION_SUMMARY_QUERY, email_context=transcript)
+    
+    def summarize_emails(self, email_ids: List[int]) -> Dict[int, str]:
+        """
+        Summarize several emails in one batched LLM submission.
+        
+        Summaries already in the response cache are not resubmitted.
+        
+        Args:
+            email_ids: Emails to summarize
+            
+        Returns:
+            Mapping of email ID to summary text
+        """
+        emails = self.db.get_emails_by_ids(email_ids)
+        if not emails:
+            return {}
+        
+        summaries = {}
+        misses = []
+        for email in emails:
+            cached = self._get_cached_response(SUMMARY_QUERY, email.id)
+            if cached:
+                summaries[email.id] = cached
+            else:
+                misses.append(email)
+        
+        responses = self.llm.answer_queries_batch(
+            queries=[SUMMARY_QUERY] * len(misses),
+            email_contexts=[self._build_email_context(email) for email in misses]
+        )
+        
+        for email, response in zip(misses, responses):
+            if response:
+                self._cache_response(SUMMARY_QUERY, email.id, response)
+            summaries[email.id] = response or "Unable to generate summary."
+        
+        return {email.id: summaries[email.id] for email in emails}
+    
+    async def summarize_many(self, email_ids: List[int]) -> Dict[int, str]:
+        """
+        Summarize several emails with concurrent LLM calls.
+        
+        Wall-clock time is roughly that of the slowest call rather than the sum.
+        
+        Args:
+            email_ids: Emails to summarize
+            
+        Returns:
+            Mapping of email ID to summary text
+        """
+        emails = self.db.get_emails_by_ids(email_ids)
+        summaries = await asyncio.gather(*(self._summarize_one(email) for email in emails))
+        return {email.id: summary for email, summary in zip(emails, summaries)}
+    
+    async def _summarize_one(self, email: Email) -> str:
+        """Summarize a single already-loaded email asynchronously."""
+        cached = self._get_cached_response(SUMMARY_QUERY, email.id)
+        if cached:
+            return cached
+        
+        response = await self.llm.aanswer_query(
+            query=SUMMARY_QUERY,
+            email_context=self._build_email_context(email)
+        )
+        if response:
+            self._cache_response(SUMMARY_QUERY, email.id, response)
         return response or "Unable to generate summary."
     
     def extract_tasks_from_email(self, email_id: int) -> str:
@@ -176,19 +404,19 @@ class EmailAgent:
         
         if email.action_items and len(email.action_items) > 0:
             # Format existing action items
-            tasks = []
-            for i, item in enumerate(email.action_items, 1):
-                task_str = f"{i}. {item.get('task', 'Unknown task')}"
-                if item.get('deadline'):
-                    task_str += f" (Due: {item['deadline']})"
-                if item.get('priority'):
-                    task_str += f" [Priority: {item['priority']}]"
-                tasks.append(task_str)
+            tasks = [self._format_task(i, item) for i, item in enumerate(email.action_items, 1)]
             
             return "📋 **Action Items:**\n" + "\n".join(tasks)
         else:
             return "No action items found in this email."
     
+    @staticmethod
+    def _format_task(index: int, item: Dict[str, Any]) -> str:
+        """Format one action item as a numbered task line."""
+        deadline = f" (Due: {item['deadline']})" if item.get('deadline') else ""
+        priority = f" [Priority: {item['priority']}]" if item.get('priority') else ""
+        return f"{index}. {item.get('task', 'Unknown task')}{deadline}{priority}"
+    
     def search_inbox(self, query: str) -> str:
         """
         Search inbox and return formatted results.
@@ -199,7 +427,7 @@ class EmailAgent:
         Returns:
             Formatted search results
         """
-        emails = self.db.search_emails(query=query)
+        emails = self.db.get_email_headers(query=query) or self._fuzzy_search_subjects(query)
         
         if not emails:
             return f"No emails found matching '{query}'."
@@ -213,6 +441,27 @@ class EmailAgent:
         
         return "\n".join(results)
     
+    def _fuzzy_search_subjects(self, query: str, limit: int = 10) -> List[EmailHeader]:
+        """
+        Fall back to typo-tolerant subject matching when full-text search finds nothing.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of matches
+            
+        Returns:
+            Best matching email headers, or an empty list if rapidfuzz is unavailable
+        """
+        if fuzzy_process is None or not query.strip():
+            return []
+        
+        headers = self.db.get_email_headers()
+        matches = fuzzy_process.extract(
+            query, [header.subject for header in headers],
+            scorer=fuzz.WRatio, limit=limit, score_cutoff=FUZZY_SEARCH_CUTOFF
+        )
+        return [headers[index] for _, _, index in matches]
+    
     def get_urgent_emails(self) -> str:
         """
         Get list of urgent/important emails.
@@ -220,10 +469,7 @@ class EmailAgent:
         Returns:
             Formatted list of urgent emails
         """
-        emails = self.db.search_emails(category="Important")
-        todo_emails = self.db.search_emails(category="To-Do")
-        
-        urgent = emails + todo_emails
+        urgent = self.db.search_emails_by_categories(["Important", "To-Do"])
         
         if not urgent:
             return "📭 No urgent emails at the moment!"
@@ -235,6 +481,17 @@ class EmailAgent:
         
         return "\n".join(results)
     
+    def _get_cached_response(self, query: str, email_id: Optional[int]) -> Optional[str]:
+        """Look up a semantically similar cached response, if caching is enabled."""
+        if not self.response_cache:
+            return None
+        return self.response_cache.lookup(query, email_id)
+    
+    def _cache_response(self, query: str, email_id: Optional[int], response: str):
+        """Store a response in the semantic cache, if caching is enabled."""
+        if self.response_cache:
+            self.response_cache.store(query, email_id, response)
+    
     def _build_email_context(self, email: Email) -> str:
         """
         Build context string for a single email.
@@ -256,8 +513,7 @@ class EmailAgent:
         
         if email.action_items:
             context_parts.append(f"\nAction Items: {len(email.action_items)}")
-            for item in email.action_items:
-                context_parts.append(f"  - {item.get('task', 'Unknown')}")
+            context_parts.extend(f"  - {item.get('task', 'Unknown')}" for item in email.action_items)
         
         return "\n".join(context_parts)
     
@@ -271,30 +527,25 @@ class EmailAgent:
         Returns:
             Formatted context string
         """
-        # Get summary statistics
-        all_emails = self.db.get_all_emails()
+        # Get summary statistics aggregated in SQL
+        stats = self.db.get_inbox_stats()
         
-        if not all_emails:
+        if not stats:
             return "Inbox is empty."
         
-        # Category breakdown
-        categories = {}
-        total_actions = 0
-        
-        for email in all_emails:
-            cat = email.category or "Uncategorized"
-            categories[cat] = categories.get(cat, 0) + 1
-            total_actions += len(email.action_items)
+        total_emails = sum(count for _, count, _, _ in stats)
+        total_actions = sum(actions for _, _, actions, _ in stats)
+        categories = ", ".join(f"{cat or 'Uncategorized'}: {count}" for cat, count, _, _ in stats)
         
         context_parts = [
-            f"Total Emails: {len(all_emails)}",
-            f"Categories: {', '.join(f'{k}: {v}' for k, v in categories.items())}",
+            f"Total Emails: {total_emails}",
+            f"Categories: {categories}",
             f"Total Action Items: {total_actions}",
             "\nRecent Emails:"
         ]
         
         # Add recent emails
-        for email in all_emails[:5]:
+        for email in self.db.get_recent_email_headers(5):
             context_parts.append(
                 f"  - [{email.category or 'N/A'}] {email.subject} from {email.sender}"
             )
@@ -311,13 +562,7 @@ class EmailAgent:
         Returns:
             True if inbox-wide query
         """
-        inbox_keywords = [
-            "show", "list", "urgent", "important", "all",
-            "how many", "what", "tasks", "emails from"
-        ]
-        
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in inbox_keywords)
+        return _INBOX_QUERY_PATTERN.search(query) is not None
 
 
 # Singleton agent instance
@@ -16,14 +16,26 @@ class Config:
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    # JSON-schema structured outputs (not supported by gpt-3.5 / original gpt-4 models)
+    OPENAI_STRUCTURED_OUTPUTS: bool = os.getenv(
+        "OPENAI_STRUCTURED_OUTPUTS",
+        "false" if OPENAI_MODEL == "gpt-4" or OPENAI_MODEL.startswith(("gpt-3.5", "gpt-4-")) else "true"
+    ).lower() == "true"
     
     # Ollama Configuration
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama3.2")
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "1h")
+    # JSON-schema constrained decoding (Ollama 0.5+; older servers only support format="json")
+    OLLAMA_STRUCTURED_OUTPUTS: bool = os.getenv("OLLAMA_STRUCTURED_OUTPUTS", "true").lower() == "true"
     
     # General LLM Settings
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
     TIMEOUT_SECONDS: int = int(os.getenv("TIMEOUT_SECONDS", "60"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    # Emails categorized per LLM call in batch runs (0 = analyze each email in one fused call)
+    BATCH_CATEGORIZATION_SIZE: int = int(os.getenv("BATCH_CATEGORIZATION_SIZE", "0"))
+    BATCH_CATEGORIZATION_MAX_CHARS: int = int(os.getenv("BATCH_CATEGORIZATION_MAX_CHARS", "12000"))
     
     # Database Configuration
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "data/email_agent.db")
@@ -38,8 +50,38 @@ class Config:
     DRAFT_GENERATION_TEMPERATURE: float = 0.8
     AGENT_RESPONSE_TEMPERATURE: float = 0.7
     
+    # Semantic Response Cache Settings
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL_SECONDS: int = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+    
+    # Local Classifier Settings (skip the LLM for confidently categorized emails)
+    LOCAL_CLASSIFIER_ENABLED: bool = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+    LOCAL_CLASSIFIER_THRESHOLD: float = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75"))
+    LOCAL_CLASSIFIER_MIN_EXAMPLES: int = int(os.getenv("LOCAL_CLASSIFIER_MIN_EXAMPLES", "20"))
+    
+    # Rule Classifier Settings (deterministic categories that need no model at all)
+    RULE_CLASSIFIER_ENABLED: bool = os.getenv("RULE_CLASSIFIER_ENABLED", "true").lower() == "true"
+    NEWSLETTER_DOMAINS_PATH: str = os.getenv("NEWSLETTER_DOMAINS_PATH", "data/newsletter_domains.txt")
+    BLOCKED_SENDERS_PATH: str = os.getenv("BLOCKED_SENDERS_PATH", "data/blocked_senders.txt")
+    FREQUENT_CONTACT_MIN_EMAILS: int = int(os.getenv("FREQUENT_CONTACT_MIN_EMAILS", "3"))
+    
+    # LLM Completion Cache Settings
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAXSIZE: int = int(os.getenv("LLM_CACHE_MAXSIZE", "4096"))
+    # Persist exact completions in SQLite so repeat emails skip the LLM across runs
+    LLM_CACHE_PERSIST: bool = os.getenv("LLM_CACHE_PERSIST", "true").lower() == "true"
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_SEMANTIC_CACHE_ENABLED: bool = os.getenv("LLM_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    LLM_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.97"))
+    
     # Conversation Settings
     MAX_CONVERSATION_HISTORY: int = 5
+    # Fold chat turns that fall out of the history window into a running summary
+    CONVERSATION_SUMMARY_ENABLED: bool = os.getenv("CONVERSATION_SUMMARY_ENABLED", "true").lower() == "true"
+    # Token budgets for agent queries (keeps long inbox dumps within the model's context window)
+    MAX_CONTEXT_TOKENS: int = int(os.getenv("MAX_CONTEXT_TOKENS", "3000"))
+    MAX_HISTORY_TOKENS: int = int(os.getenv("MAX_HISTORY_TOKENS", "1500"))
     
     @classmethod
     def validate(cls) -> tuple[bool, str]:
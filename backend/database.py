@@ -1,19 +1,23 @@
 """Database operations for Email Productivity Agent."""
 import sqlite3
-import json
 import logging
+import re
+import tempfile
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from contextlib import contextmanager
 
 from backend.config import config
-from backend.models import Email, Prompt, Draft, ProcessingLog
+from backend.models import Email, EmailHeader, Prompt, Draft, ProcessingLog
+from backend.serialization import json_loads, json_dumps, parse_datetime
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+_FTS_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
 
 class Database:
     """SQLite database manager."""
@@ -21,26 +25,91 @@ class Database:
     def __init__(self, db_path: str = None):
         """Initialize database connection."""
         self.db_path = db_path or config.DATABASE_PATH
-        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        if self.db_path == ":memory:":
+            # A private temporary file rather than a shared-cache memory database: every
+            # thread's connection sees the same data, WAL lets writers wait on each other
+            # instead of failing with SQLITE_LOCKED, and close() keeps the data; the
+            # directory is removed when this object is garbage collected
+            self._tempdir = tempfile.TemporaryDirectory(prefix="email_agent_")
+            self._connect_target = str(Path(self._tempdir.name) / "email_agent.db")
+        else:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._connect_target = self.db_path
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach those of worker threads too;
+        # bumping the generation makes threads reopen after a close()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        self.fts_enabled = False
+        self._prompt_cache: Dict[str, Prompt] = {}
+        self._all_prompts: Optional[List[Prompt]] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's persistent connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = sqlite3.connect(
+                self._connect_target,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=256
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            conn.execute("PRAGMA cache_size=-65536")
+            with self._connections_lock:
+                self._connections.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
     
     @contextmanager
-    def get_connection(self):
-        """Get database connection context manager."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+    def get_connection(self, write: bool = False):
+        """
+        Get database connection context manager (one transaction per outermost block).
+        
+        Args:
+            write: Take the write lock up front. A deferred transaction that reads
+                before writing (the FTS triggers do) fails with "database is locked"
+                instead of waiting when another thread commits in between.
+        """
+        conn = self._connect()
+        outermost = self._local.depth == 0
+        if outermost:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        self._local.depth += 1
         try:
             yield conn
-            conn.commit()
+            if outermost:
+                conn.execute("COMMIT")
         except Exception as e:
-            conn.rollback()
+            if outermost:
+                conn.execute("ROLLBACK")
             logger.error(f"Database error: {e}")
             raise
         finally:
-            conn.close()
+            self._local.depth -= 1
+    
+    def close(self):
+        """Close the persistent connections of every thread (each reopens on next use)."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to close database connection: {e}")
+        self._local.conn = None
     
     def init_database(self):
         """Initialize database schema."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             # Emails table
@@ -54,11 +123,20 @@ class Database:
                     has_attachment INTEGER DEFAULT 0,
                     category TEXT,
                     action_items_json TEXT,
+                    action_items_count INTEGER DEFAULT 0,
                     processed INTEGER DEFAULT 0,
                     created_at TEXT NOT NULL
                 )
             """)
             
+            # Add denormalized action item count to databases created before it existed
+            cursor.execute("PRAGMA table_info(emails)")
+            if "action_items_count" not in {row['name'] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE emails ADD COLUMN action_items_count INTEGER DEFAULT 0")
+                cursor.execute("""
+                    UPDATE emails SET action_items_count = COALESCE(json_array_length(action_items_json), 0)
+                """)
+            
             # Prompts table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS prompts (
@@ -98,36 +176,135 @@ class Database:
                 )
             """)
             
+            # Semantic response cache table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    embedding BLOB NOT NULL,
+                    query TEXT NOT NULL,
+                    email_id INTEGER,
+                    response TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            
+            # Exact LLM completion cache table (keyed by request digest)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    key BLOB PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            """)
+            
+            # Change counter for emails, bumped by triggers so every session (and
+            # process) sees the same version and can key its caches on it
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS emails_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO emails_version (id, version) VALUES (1, 0)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS emails_version_{event.lower()} AFTER {event} ON emails BEGIN
+                        UPDATE emails_version SET version = version + 1 WHERE id = 1;
+                    END
+                """)
+            
+            # Full-text search index over emails
+            self.fts_enabled = self._init_fts(cursor)
+            
             # Create indexes
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_category ON emails(category)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_processed ON emails(processed)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_drafts_email_id ON drafts(email_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_email_id ON processing_logs(email_id)")
             
             logger.info("Database initialized successfully")
     
+    def _init_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the FTS5 index over emails and the triggers keeping it in sync.
+        
+        Returns:
+            True if full-text search is available
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                    sender, subject, body,
+                    content='emails', content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+            return False
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS emails_ai AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, sender, subject, body)
+                VALUES (new.id, new.sender, new.subject, new.body);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS emails_ad AFTER DELETE ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, sender, subject, body)
+                VALUES ('delete', old.id, old.sender, old.subject, old.body);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS emails_au AFTER UPDATE OF sender, subject, body ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, sender, subject, body)
+                VALUES ('delete', old.id, old.sender, old.subject, old.body);
+                INSERT INTO emails_fts (rowid, sender, subject, body)
+                VALUES (new.id, new.sender, new.subject, new.body);
+            END
+        """)
+        
+        # Index emails that were stored before the FTS table existed
+        if not exists:
+            cursor.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+        
+        return True
+    
     # Email operations
     def insert_email(self, email: Email) -> int:
         """Insert email into database."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO emails (id, sender, subject, body, timestamp, has_attachment, 
-                                    category, action_items_json, processed, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                email.id,
-                email.sender,
-                email.subject,
-                email.body,
-                email.timestamp.isoformat() if isinstance(email.timestamp, datetime) else email.timestamp,
-                int(email.has_attachment),
-                email.category,
-                json.dumps(email.action_items),
-                int(email.processed),
-                email.created_at.isoformat()
-            ))
+                                    category, action_items_json, action_items_count, processed, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, self._email_to_row(email))
             return cursor.lastrowid
     
+    def insert_emails_bulk(self, emails: List[Email]) -> int:
+        """
+        Insert many emails in a single transaction, skipping IDs that already exist.
+        
+        Returns:
+            Number of emails inserted
+        """
+        if not emails:
+            return 0
+        
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR IGNORE INTO emails (id, sender, subject, body, timestamp, has_attachment, 
+                                              category, action_items_json, action_items_count, processed, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [self._email_to_row(email) for email in emails])
+            return cursor.rowcount
+    
     def get_email(self, email_id: int) -> Optional[Email]:
         """Get email by ID."""
         with self.get_connection() as conn:
@@ -147,10 +324,56 @@ class Database:
             rows = cursor.fetchall()
             return [self._row_to_email(row) for row in rows]
     
+    def get_emails_page(
+        self,
+        page_cursor: Optional[Tuple[str, int]] = None,
+        limit: int = 50
+    ) -> Tuple[List[Email], Optional[Tuple[str, int]]]:
+        """
+        Get one page of emails, newest first, using keyset pagination.
+        
+        Each page seeks past the previous page's last (timestamp, id) on the
+        timestamp index instead of scanning and discarding OFFSET rows, so
+        later pages cost the same as the first and rows inserted meanwhile
+        don't shift page boundaries.
+        
+        Args:
+            page_cursor: Cursor returned with the previous page, None for the first page
+            limit: Maximum emails per page
+            
+        Returns:
+            Tuple of (emails, next_cursor); next_cursor is None on the last page
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if page_cursor is None:
+                cursor.execute("SELECT * FROM emails ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,))
+            else:
+                cursor.execute("""
+                    SELECT * FROM emails WHERE (timestamp, id) < (?, ?)
+                    ORDER BY timestamp DESC, id DESC LIMIT ?
+                """, (*page_cursor, limit))
+            rows = cursor.fetchall()
+        
+        next_cursor = (rows[-1]['timestamp'], rows[-1]['id']) if len(rows) == limit else None
+        return [self._row_to_email(row) for row in rows], next_cursor
+    
+    def get_emails_by_ids(self, email_ids: List[int]) -> List[Email]:
+        """Get multiple emails by ID in a single query, preserving input order."""
+        if not email_ids:
+            return []
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" * len(email_ids))
+            cursor.execute(f"SELECT * FROM emails WHERE id IN ({placeholders})", list(email_ids))
+            emails_by_id = {row['id']: self._row_to_email(row) for row in cursor.fetchall()}
+            return [emails_by_id[email_id] for email_id in email_ids if email_id in emails_by_id]
+    
     def update_email(self, email_id: int, category: str = None, 
                      action_items: List[Dict] = None, processed: bool = None):
         """Update email fields."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             updates = []
             params = []
@@ -161,7 +384,9 @@ class Database:
             
             if action_items is not None:
                 updates.append("action_items_json = ?")
-                params.append(json.dumps(action_items))
+                params.append(json_dumps(action_items))
+                updates.append("action_items_count = ?")
+                params.append(len(action_items))
             
             if processed is not None:
                 updates.append("processed = ?")
@@ -177,31 +402,186 @@ class Database:
         """Search emails with filters."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            conditions = []
-            params = []
-            
-            if query:
-                conditions.append("(subject LIKE ? OR body LIKE ? OR sender LIKE ?)")
-                search_term = f"%{query}%"
-                params.extend([search_term, search_term, search_term])
-            
-            if category:
-                conditions.append("category = ?")
-                params.append(category)
-            
-            if processed is not None:
-                conditions.append("processed = ?")
-                params.append(int(processed))
-            
-            where_clause = " AND ".join(conditions) if conditions else "1=1"
-            cursor.execute(f"SELECT * FROM emails WHERE {where_clause} ORDER BY timestamp DESC", params)
+            cursor.execute(*self._build_search_query("emails.*", query, category, processed))
             rows = cursor.fetchall()
             return [self._row_to_email(row) for row in rows]
     
+    def get_email_headers(self, query: str = None, category: str = None,
+                          processed: bool = None) -> List[EmailHeader]:
+        """Search emails with filters, returning only list-view columns without rehydration."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(*self._build_search_query(
+                "emails.id, emails.sender, emails.subject, emails.category, emails.timestamp",
+                query, category, processed
+            ))
+            return list(map(EmailHeader._make, cursor.fetchall()))
+    
+    def search_emails_by_categories(self, categories: List[str],
+                                    limit: Optional[int] = None) -> List[EmailHeader]:
+        """
+        Get email headers in any of the given categories with one query.
+        
+        Results are ordered by the position of their category in the list, then newest first.
+        """
+        if not categories:
+            return []
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            placeholders = ", ".join("?" * len(categories))
+            priority = " ".join(f"WHEN ? THEN {i}" for i in range(len(categories)))
+            params = list(categories) + list(categories)
+            sql = f"""
+                SELECT id, sender, subject, category, timestamp FROM emails
+                WHERE category IN ({placeholders})
+                ORDER BY CASE category {priority} END, timestamp DESC
+            """
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            cursor.execute(sql, params)
+            return list(map(EmailHeader._make, cursor.fetchall()))
+    
+    def get_recent_email_headers(self, limit: int = 5) -> List[EmailHeader]:
+        """Get list-view columns for the most recent emails."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT id, sender, subject, category, timestamp FROM emails
+                ORDER BY timestamp DESC LIMIT ?
+            """, (limit,))
+            return list(map(EmailHeader._make, cursor.fetchall()))
+    
+    def get_categorized_email_texts(self, limit: int = 5000) -> List[tuple]:
+        """
+        Get text and category of processed emails (training data for local classification).
+        
+        Returns:
+            List of (sender, subject, body, category) tuples, most recent first
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT sender, subject, body, category FROM emails
+                WHERE processed = 1 AND category IS NOT NULL
+                ORDER BY timestamp DESC LIMIT ?
+            """, (limit,))
+            return cursor.fetchall()
+    
+    def get_frequent_senders(self, min_count: int = 3) -> List[str]:
+        """
+        Get senders that appear in at least min_count emails.
+        
+        Args:
+            min_count: Minimum number of emails from the sender
+        
+        Returns:
+            List of sender strings as stored
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT sender FROM emails GROUP BY sender HAVING COUNT(*) >= ?
+            """, (min_count,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_emails_version(self) -> int:
+        """Counter bumped by every insert, update or delete of an email, for keying caches."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT version FROM emails_version WHERE id = 1")
+            row = cursor.fetchone()
+            return row[0] if row else 0
+    
+    def get_inbox_stats(self) -> List[tuple]:
+        """
+        Aggregate email, action item and processed counts per category in SQL.
+        
+        Returns:
+            List of (category, email_count, action_item_count, processed_count) tuples,
+            largest category first
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT category, COUNT(*), COALESCE(SUM(action_items_count), 0), COALESCE(SUM(processed), 0)
+                FROM emails GROUP BY category ORDER BY COUNT(*) DESC
+            """)
+            return cursor.fetchall()
+    
+    def get_recent_processed_subjects(self, limit: int = 5) -> List[str]:
+        """Subjects of the newest processed emails, newest first."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                "SELECT subject FROM emails WHERE processed = 1 ORDER BY timestamp DESC LIMIT ?", (limit,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
+    def _build_search_query(self, columns: str, query: str = None, category: str = None,
+                            processed: bool = None) -> tuple:
+        """
+        Build the SQL and parameters for an email search.
+        
+        Results are newest first either way. With FTS5 the text query matches
+        whole words or word prefixes ("inv" finds "invoice"), not arbitrary
+        substrings as the LIKE fallback does ("voice" does not find "invoice").
+        
+        Returns:
+            Tuple of (sql, params)
+        """
+        conditions = []
+        params = []
+        match_expression = self._fts_match_expression(query) if query and self.fts_enabled else None
+        
+        if match_expression:
+            conditions.append("emails_fts MATCH ?")
+            params.append(match_expression)
+        elif query:
+            conditions.append("(subject LIKE ? OR body LIKE ? OR sender LIKE ?)")
+            search_term = f"%{query}%"
+            params.extend([search_term, search_term, search_term])
+        
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        
+        if processed is not None:
+            conditions.append("processed = ?")
+            params.append(int(processed))
+        
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        if match_expression:
+            sql = f"""
+                SELECT {columns} FROM emails
+                JOIN emails_fts ON emails_fts.rowid = emails.id
+                WHERE {where_clause} ORDER BY emails.timestamp DESC, emails_fts.rank
+            """
+        else:
+            sql = f"SELECT {columns} FROM emails WHERE {where_clause} ORDER BY timestamp DESC"
+        return sql, params
+    
+    @staticmethod
+    def _fts_match_expression(query: str) -> Optional[str]:
+        """Convert free text into an FTS5 expression requiring every term as a prefix."""
+        tokens = _FTS_TOKEN_PATTERN.findall(query)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+    
     # Prompt operations
     def insert_prompt(self, prompt: Prompt) -> int:
         """Insert or update prompt."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO prompts (prompt_type, prompt_text, is_active, created_at, updated_at)
@@ -213,10 +593,45 @@ class Database:
                 prompt.created_at.isoformat(),
                 datetime.utcnow().isoformat()
             ))
-            return cursor.lastrowid
+            prompt_id = cursor.lastrowid
+        
+        self._prompt_cache.pop(prompt.prompt_type, None)
+        self._all_prompts = None
+        return prompt_id
+    
+    def insert_prompts_bulk(self, prompts: List[Prompt]) -> int:
+        """
+        Insert or update many prompts in a single transaction.
+        
+        Returns:
+            Number of prompts written
+        """
+        if not prompts:
+            return 0
+        
+        updated_at = datetime.utcnow().isoformat()
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR REPLACE INTO prompts (prompt_type, prompt_text, is_active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (prompt.prompt_type, prompt.prompt_text, int(prompt.is_active),
+                 prompt.created_at.isoformat(), updated_at)
+                for prompt in prompts
+            ])
+        
+        for prompt in prompts:
+            self._prompt_cache.pop(prompt.prompt_type, None)
+        self._all_prompts = None
+        return len(prompts)
     
     def get_prompt(self, prompt_type: str) -> Optional[Prompt]:
-        """Get active prompt by type."""
+        """Get active prompt by type (memoized until the prompt is next saved)."""
+        cached = self._prompt_cache.get(prompt_type)
+        if cached is not None:
+            return cached
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
@@ -225,21 +640,29 @@ class Database:
             row = cursor.fetchone()
             
             if row:
-                return self._row_to_prompt(row)
+                prompt = self._row_to_prompt(row)
+                self._prompt_cache[prompt_type] = prompt
+                return prompt
             return None
     
     def get_all_prompts(self) -> List[Prompt]:
-        """Get all active prompts."""
+        """Get all active prompts (memoized until a prompt is next saved)."""
+        cached = self._all_prompts
+        if cached is not None:
+            return list(cached)
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM prompts WHERE is_active = 1")
             rows = cursor.fetchall()
-            return [self._row_to_prompt(row) for row in rows]
+            prompts = [self._row_to_prompt(row) for row in rows]
+            self._all_prompts = prompts
+            return list(prompts)
     
     # Draft operations
     def insert_draft(self, draft: Draft) -> int:
         """Insert draft."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO drafts (email_id, subject, body, metadata_json, created_at)
@@ -248,7 +671,7 @@ class Database:
                 draft.email_id,
                 draft.subject,
                 draft.body,
-                json.dumps(draft.metadata),
+                json_dumps(draft.metadata),
                 draft.created_at.isoformat()
             ))
             return cursor.lastrowid
@@ -266,28 +689,39 @@ class Database:
     
     def delete_draft(self, draft_id: int):
         """Delete draft."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
     
     # Processing log operations
     def insert_log(self, log: ProcessingLog) -> int:
         """Insert processing log."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO processing_logs (email_id, operation, status, llm_response, error_message, timestamp)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                log.email_id,
-                log.operation,
-                log.status,
-                log.llm_response,
-                log.error_message,
-                log.timestamp.isoformat()
-            ))
+            """, self._log_to_row(log))
             return cursor.lastrowid
     
+    def insert_logs_bulk(self, logs: List[ProcessingLog]) -> int:
+        """
+        Insert many processing logs in a single transaction.
+        
+        Returns:
+            Number of logs inserted
+        """
+        if not logs:
+            return 0
+        
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO processing_logs (email_id, operation, status, llm_response, error_message, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [self._log_to_row(log) for log in logs])
+            return cursor.rowcount
+    
     def get_logs(self, email_id: int = None, limit: int = 50) -> List[ProcessingLog]:
         """Get processing logs."""
         with self.get_connection() as conn:
@@ -302,12 +736,68 @@ class Database:
             rows = cursor.fetchall()
             return [self._row_to_log(row) for row in rows]
     
+    # Response cache operations
+    def insert_cached_response(self, embedding: bytes, query: str,
+                               email_id: Optional[int], response: str,
+                               created_at: datetime) -> int:
+        """Insert semantic cache entry."""
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO response_cache (embedding, query, email_id, response, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (embedding, query, email_id, response, created_at.isoformat()))
+            return cursor.lastrowid
+    
+    def get_cached_responses(self, since: datetime) -> List[sqlite3.Row]:
+        """Get semantic cache entries created after a cutoff."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, embedding, query, email_id, response, created_at
+                FROM response_cache WHERE created_at >= ? ORDER BY id
+            """, (since.isoformat(),))
+            return cursor.fetchall()
+    
+    def delete_cached_responses(self, before: datetime) -> int:
+        """Delete semantic cache entries created before a cutoff."""
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM response_cache WHERE created_at < ?", (before.isoformat(),))
+            return cursor.rowcount
+    
+    def get_llm_cached_response(self, key: bytes, since: datetime) -> Optional[str]:
+        """Get an LLM completion cached under a request digest after a cutoff."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT response FROM llm_response_cache WHERE key = ? AND created_at >= ?
+            """, (key, since.isoformat()))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def put_llm_cached_response(self, key: bytes, response: str, created_at: datetime):
+        """Store (or refresh) an LLM completion under a request digest."""
+        with self.get_connection(write=True) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_response_cache (key, response, created_at)
+                VALUES (?, ?, ?)
+            """, (key, response, created_at.isoformat()))
+    
+    def delete_llm_cached_responses(self, before: datetime) -> int:
+        """Delete LLM completions cached before a cutoff."""
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM llm_response_cache WHERE created_at < ?", (before.isoformat(),))
+            return cursor.rowcount
+    
     # Helper methods
     def _row_to_email(self, row: sqlite3.Row) -> Email:
         """Convert database row to Email object."""
-        action_items = json.loads(row['action_items_json']) if row['action_items_json'] else []
-        timestamp = datetime.fromisoformat(row['timestamp']) if row['timestamp'] else datetime.utcnow()
-        created_at = datetime.fromisoformat(row['created_at']) if row['created_at'] else datetime.utcnow()
+        action_items = self._decode_json(row['action_items_json'], list)
+        timestamp = parse_datetime(row['timestamp']) if row['timestamp'] else datetime.utcnow()
+        created_at = parse_datetime(row['created_at']) if row['created_at'] else datetime.utcnow()
         
         return Email(
             id=row['id'],
@@ -322,6 +812,42 @@ class Database:
             created_at=created_at
         )
     
+    @staticmethod
+    def _email_to_row(email: Email) -> tuple:
+        """Convert Email object to an emails table row."""
+        return (
+            email.id,
+            email.sender,
+            email.subject,
+            email.body,
+            email.timestamp.isoformat() if isinstance(email.timestamp, datetime) else email.timestamp,
+            int(email.has_attachment),
+            email.category,
+            json_dumps(email.action_items),
+            len(email.action_items),
+            int(email.processed),
+            email.created_at.isoformat()
+        )
+    
+    @staticmethod
+    def _log_to_row(log: ProcessingLog) -> tuple:
+        """Convert ProcessingLog object to a processing_logs table row."""
+        return (
+            log.email_id,
+            log.operation,
+            log.status,
+            log.llm_response,
+            log.error_message,
+            log.timestamp.isoformat()
+        )
+    
+    @staticmethod
+    def _decode_json(blob: Optional[str], empty_factory: type) -> Any:
+        """Decode a JSON column, skipping the decoder for empty values."""
+        if not blob or blob == "[]" or blob == "{}":
+            return empty_factory()
+        return json_loads(blob)
+    
     def _row_to_prompt(self, row: sqlite3.Row) -> Prompt:
         """Convert database row to Prompt object."""
         return Prompt(
@@ -329,20 +855,20 @@ class Database:
             prompt_type=row['prompt_type'],
             prompt_text=row['prompt_text'],
             is_active=bool(row['is_active']),
-            created_at=datetime.fromisoformat(row['created_at']),
-            updated_at=datetime.fromisoformat(row['updated_at'])
+            created_at=parse_datetime(row['created_at']),
+            updated_at=parse_datetime(row['updated_at'])
         )
     
     def _row_to_draft(self, row: sqlite3.Row) -> Draft:
         """Convert database row to Draft object."""
-        metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
+        metadata = self._decode_json(row['metadata_json'], dict)
         return Draft(
             id=row['id'],
             email_id=row['email_id'],
             subject=row['subject'],
             body=row['body'],
             metadata=metadata,
-            created_at=datetime.fromisoformat(row['created_at'])
+            created_at=parse_datetime(row['created_at'])
         )
     
     def _row_to_log(self, row: sqlite3.Row) -> ProcessingLog:
@@ -354,7 +880,7 @@ class Database:
             status=row['status'],
             llm_response=row['llm_response'],
             error_message=row['error_message'],
-            timestamp=datetime.fromisoformat(row['timestamp'])
+            timestamp=parse_datetime(row['timestamp'])
         )
 
 
@@ -369,4 +895,5 @@ def init_database():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     init_database()
@@ -1,18 +1,26 @@
 """Email processing pipeline."""
 import logging
-import json
+import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
 
+from backend.config import config
 from backend.database import db
+from backend.local_classifier import local_classifier
+from backend.log_sink import log_sink
+from backend.rule_classifier import rule_classifier
 from backend.unified_llm_service import unified_llm_service
 from backend.models import Email, ProcessingLog
+from backend.serialization import iter_json_array
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+# Emails inserted per transaction when loading an inbox file
+LOAD_BATCH_SIZE = 1000
+
 
 class EmailProcessor:
     """Email processing pipeline manager."""
@@ -21,6 +29,14 @@ class EmailProcessor:
         """Initialize processor."""
         self.db = db
         self.llm = unified_llm_service
+        self.rules = rule_classifier if config.RULE_CLASSIFIER_ENABLED else None
+        self.classifier = local_classifier if config.LOCAL_CLASSIFIER_ENABLED else None
+        self.log_sink = log_sink
+        # Runs action extraction alongside categorization when the two need separate LLM calls
+        self._step_executor = ThreadPoolExecutor(
+            max_workers=max(1, config.BATCH_CONCURRENCY),
+            thread_name_prefix="email-step"
+        )
     
     def load_mock_inbox(self, json_path: str = "data/mock_inbox.json") -> int:
         """
@@ -33,37 +49,46 @@ class EmailProcessor:
             Number of emails loaded
         """
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                emails_data = json.load(f)
-            
             loaded_count = 0
-            for email_data in emails_data:
-                email = Email.from_dict(email_data)
-                try:
-                    self.db.insert_email(email)
-                    loaded_count += 1
-                except Exception as e:
-                    logger.warning(f"Skipping duplicate email ID {email.id}: {e}")
+            batch: List[Email] = []
+            with open(json_path, 'rb') as f:
+                for email_data in iter_json_array(f):
+                    batch.append(Email.from_dict(email_data))
+                    if len(batch) >= LOAD_BATCH_SIZE:
+                        loaded_count += self.db.insert_emails_bulk(batch)
+                        batch = []
+            loaded_count += self.db.insert_emails_bulk(batch)
             
-            logger.info(f"Loaded {loaded_count} emails from {json_path}")
+            logger.info(f"Loaded {loaded_count} emails from {json_path} (existing IDs skipped)")
             return loaded_count
             
         except FileNotFoundError:
             logger.error(f"Mock inbox file not found: {json_path}")
             return 0
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             logger.error(f"Invalid JSON in mock inbox: {e}")
             return 0
         except Exception as e:
             logger.error(f"Error loading mock inbox: {e}")
             return 0
     
-    def process_email(self, email_id: int) -> bool:
+    def process_email(
+        self,
+        email_id: int,
+        local_prediction: Optional[Tuple[Optional[str], float]] = None,
+        batch_category: Optional[str] = None,
+        rule_category: Optional[str] = None,
+        rules_checked: bool = False
+    ) -> bool:
         """
         Process single email through categorization and action extraction pipeline.
         
         Args:
             email_id: ID of email to process
+            local_prediction: Precomputed local classifier (category, confidence)
+            batch_category: Category already assigned by a batched LLM call
+            rule_category: Category a rule pre-pass already assigned
+            rules_checked: Whether that pre-pass ran, so the rules are not applied again
             
         Returns:
             True if processing succeeded, False otherwise
@@ -74,16 +99,38 @@ class EmailProcessor:
             logger.error(f"Email {email_id} not found")
             return False
         
-        logger.info(f"Processing email {email_id}: {email.subject}")
-        
-        # Step 1: Categorize email
-        category = self._categorize_email(email)
-        if not category:
-            self._log_processing(email_id, "categorization", "failed", error="LLM categorization failed")
-            return False
+        logger.info("Processing email %s: %s", email_id, email.subject)
         
-        # Step 2: Extract action items
-        action_items = self._extract_action_items(email)
+        # Step 1: Categorize by rule or locally when confident; only action items then need the LLM
+        if not rules_checked:
+            rule_category = self._classify_by_rules(email)
+        category = rule_category or self._classify_locally(email, local_prediction)
+        if category:
+            action_items = self._extract_action_items(email)
+        else:
+            if batch_category:
+                # Categorized together with other emails; only action items remain
+                category = batch_category
+                self._log_processing(email_id, "batch_categorization", "success", llm_response=category)
+                action_items = self._extract_action_items(email)
+            elif analysis := self._analyze_email(email):
+                # Categorized and action items extracted in one LLM call
+                category, action_items = analysis["category"], analysis["action_items"]
+            else:
+                # Fall back to separate calls (e.g. model returned malformed JSON),
+                # extracting action items concurrently with categorization
+                actions_future = self._step_executor.submit(self._extract_action_items, email)
+                category = self._categorize_email(email)
+                if not category:
+                    actions_future.cancel()
+                    self._log_processing(email_id, "categorization", "failed", error="LLM categorization failed")
+                    return False
+                
+                # Step 2: Collect extracted action items
+                action_items = actions_future.result()
+            
+            if self.classifier:
+                self.classifier.add_example(email.subject, email.body, category)
         
         # Step 3: Update email in database
         try:
@@ -101,7 +148,7 @@ class EmailProcessor:
                 llm_response=f"Category: {category}, Actions: {len(action_items)}"
             )
             
-            logger.info(f"Successfully processed email {email_id}: {category}, {len(action_items)} actions")
+            logger.info("Successfully processed email %s: %s, %d actions", email_id, category, len(action_items))
             return True
             
         except Exception as e:
@@ -109,12 +156,20 @@ class EmailProcessor:
             self._log_processing(email_id, "database_update", "failed", error=str(e))
             return False
     
-    def batch_process_emails(self, email_ids: List[int]) -> Dict[str, Any]:
+    def batch_process_emails(
+        self,
+        email_ids: List[int],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
         """
         Process multiple emails in batch.
         
+        Processing is network-bound (two LLM round-trips per email), so up to
+        BATCH_CONCURRENCY emails are kept in flight at once.
+        
         Args:
             email_ids: List of email IDs to process
+            progress_callback: Called as (completed, total) from the calling thread
             
         Returns:
             Dictionary with processing statistics
@@ -126,25 +181,314 @@ class EmailProcessor:
             "errors": []
         }
         
-        for email_id in email_ids:
-            try:
-                if self.process_email(email_id):
-                    results["successful"] += 1
-                else:
+        if not email_ids:
+            return results
+        
+        batch_categorize = config.BATCH_CATEGORIZATION_SIZE > 1
+        emails = self.db.get_emails_by_ids(email_ids) if self.classifier or batch_categorize else []
+        
+        # Classify the whole batch locally in one pass instead of once per email
+        predictions = {}
+        if self.classifier:
+            predictions = dict(zip(
+                (email.id for email in emails),
+                self.classifier.classify_many([(email.subject, email.body) for email in emails])
+            ))
+        
+        # Apply the rules once here; batched categorization and process_email reuse the outcome
+        rule_categories = {email.id: self._classify_by_rules(email) for email in emails} if self.rules else {}
+        
+        # Optionally categorize the remaining emails several per LLM call
+        batch_categories = (
+            self._categorize_in_batches(emails, predictions, rule_categories) if batch_categorize else {}
+        )
+        
+        max_workers = max(1, min(config.BATCH_CONCURRENCY, len(email_ids)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self.process_email, email_id, predictions.get(email_id), batch_categories.get(email_id),
+                    rule_categories.get(email_id), email_id in rule_categories
+                ): email_id
+                for email_id in email_ids
+            }
+            
+            for completed, future in enumerate(as_completed(futures), start=1):
+                email_id = futures[future]
+                try:
+                    if future.result():
+                        results["successful"] += 1
+                    else:
+                        results["failed"] += 1
+                        results["errors"].append(f"Email {email_id} processing failed")
+                except Exception as e:
                     results["failed"] += 1
-                    results["errors"].append(f"Email {email_id} processing failed")
+                    results["errors"].append(f"Email {email_id}: {str(e)}")
+                    logger.error(f"Error processing email {email_id}: {e}")
+                
+                if progress_callback:
+                    progress_callback(completed, results["total"])
+        
+        self.log_sink.flush()
+        logger.info(f"Batch processing complete: {results['successful']}/{results['total']} successful")
+        return results
+    
+    def _categorize_in_batches(
+        self,
+        emails: List[Email],
+        predictions: Dict[int, Tuple[Optional[str], float]],
+        rule_categories: Dict[int, Optional[str]]
+    ) -> Dict[int, str]:
+        """
+        Categorize emails that no rule or confident local prediction covers, several per LLM call.
+        
+        Args:
+            emails: Emails of the batch run
+            predictions: Local classifier (category, confidence) by email ID
+            rule_categories: Rule outcome (None when no rule applied) by email ID
+            
+        Returns:
+            Mapping of email ID to category for emails categorized successfully
+        """
+        pending = [
+            email for email in emails
+            if not rule_categories.get(email.id)
+            and predictions.get(email.id, (None, 0.0))[1] < config.LOCAL_CLASSIFIER_THRESHOLD
+        ]
+        if not pending:
+            return {}
+        
+        prompt_obj = self.db.get_prompt("categorization")
+        if not prompt_obj:
+            return {}
+        
+        categories = self.llm.categorize_emails_batch(
+            [self._email_content(email) for email in pending],
+            prompt_obj.prompt_text,
+            batch_size=config.BATCH_CATEGORIZATION_SIZE
+        )
+        return {email.id: category for email, category in zip(pending, categories) if category}
+    
+    def submit_batch_processing(self, email_ids: List[int]) -> Optional[str]:
+        """
+        Submit emails for offline processing through the provider's batch API.
+        
+        Suited to large backfills where latency doesn't matter: requests are
+        billed at a discount and bypass the real-time rate limit.
+        
+        Args:
+            email_ids: List of email IDs to process
+            
+        Returns:
+            Batch ID to pass to collect_batch_processing, or None on failure
+        """
+        categorization_prompt = self.db.get_prompt("categorization")
+        action_prompt = self.db.get_prompt("action_extraction")
+        if not categorization_prompt or not action_prompt:
+            logger.error("Processing prompts not found in database")
+            return None
+        
+        emails = {
+            email.id: self._email_content(email)
+            for email in self.db.get_emails_by_ids(email_ids)
+        }
+        if not emails:
+            return None
+        
+        return self.llm.submit_analysis_batch(
+            emails,
+            categorization_prompt.prompt_text,
+            action_prompt.prompt_text
+        )
+    
+    def collect_batch_processing(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Apply the results of a submitted batch to the database.
+        
+        Args:
+            batch_id: Batch ID returned by submit_batch_processing
+            
+        Returns:
+            Dictionary with processing statistics, or None while the batch is still running
+        """
+        batch_results = self.llm.get_analysis_batch_results(batch_id)
+        if batch_results is None:
+            return None
+        
+        results = {
+            "total": len(batch_results),
+            "successful": 0,
+            "failed": 0,
+            "errors": []
+        }
+        
+        for email_id, result in batch_results.items():
+            category = result["category"]
+            action_items = result["action_items"]
+            if not category:
+                results["failed"] += 1
+                results["errors"].append(f"Email {email_id} processing failed")
+                self._log_processing(email_id, "categorization", "failed", error="LLM returned no category")
+                continue
+            
+            try:
+                self.db.update_email(
+                    email_id=email_id,
+                    category=category,
+                    action_items=action_items,
+                    processed=True
+                )
+                self._log_processing(
+                    email_id,
+                    "complete_processing",
+                    "success",
+                    llm_response=f"Category: {category}, Actions: {len(action_items)}"
+                )
+                results["successful"] += 1
             except Exception as e:
                 results["failed"] += 1
                 results["errors"].append(f"Email {email_id}: {str(e)}")
-                logger.error(f"Error processing email {email_id}: {e}")
+                logger.error(f"Failed to update email {email_id}: {e}")
+                self._log_processing(email_id, "database_update", "failed", error=str(e))
         
-        logger.info(f"Batch processing complete: {results['successful']}/{results['total']} successful")
+        self.log_sink.flush()
+        logger.info(f"Batch {batch_id} applied: {results['successful']}/{results['total']} successful")
         return results
     
+    def batch_process_emails_offline(
+        self,
+        email_ids: List[int],
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 60 * 60
+    ) -> Dict[str, Any]:
+        """
+        Process emails through the batch API, blocking until results are applied.
+        
+        Falls back to batch_process_emails when the provider has no batch API.
+        
+        Args:
+            email_ids: List of email IDs to process
+            poll_interval: Seconds between status checks
+            timeout: Seconds to wait before giving up
+            
+        Returns:
+            Dictionary with processing statistics
+        """
+        if not self.llm.supports_batch_api:
+            return self.batch_process_emails(email_ids)
+        
+        batch_id = self.submit_batch_processing(email_ids)
+        if not batch_id:
+            return {
+                "total": len(email_ids),
+                "successful": 0,
+                "failed": len(email_ids),
+                "errors": ["Batch submission failed"]
+            }
+        
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            results = self.collect_batch_processing(batch_id)
+            if results is not None:
+                return results
+            time.sleep(poll_interval)
+        
+        logger.error(f"Timed out waiting for batch {batch_id}")
+        return {
+            "total": len(email_ids),
+            "successful": 0,
+            "failed": len(email_ids),
+            "errors": [f"Timed out waiting for batch {batch_id}"]
+        }
+    
+    def _classify_by_rules(self, email: Email) -> Optional[str]:
+        """
+        Categorize email with deterministic rules (newsletter senders, blocklist, ...).
+        
+        Args:
+            email: Email object to categorize
+            
+        Returns:
+            Category name, or None when no rule applies
+        """
+        if not self.rules:
+            return None
+        
+        category = self.rules.classify(email)
+        if category:
+            self._log_processing(email.id, "categorization_rule", "success", llm_response=category)
+        return category
+    
+    def _classify_locally(
+        self,
+        email: Email,
+        prediction: Optional[Tuple[Optional[str], float]] = None
+    ) -> Optional[str]:
+        """
+        Categorize email with the local classifier if it is confident enough.
+        
+        Args:
+            email: Email object to categorize
+            prediction: Precomputed (category, confidence), classified now if None
+            
+        Returns:
+            Category name, or None when the LLM should decide
+        """
+        if not self.classifier:
+            return None
+        
+        category, confidence = prediction or self.classifier.classify(email.subject, email.body)
+        if not category or confidence < config.LOCAL_CLASSIFIER_THRESHOLD:
+            return None
+        
+        self._log_processing(
+            email.id,
+            "local_categorization",
+            "success",
+            llm_response=f"{category} (confidence {confidence:.2f})"
+        )
+        return category
+    
+    def _analyze_email(self, email: Email) -> Optional[Dict[str, Any]]:
+        """
+        Categorize email and extract action items with a single LLM call.
+        
+        Args:
+            email: Email object to analyze
+            
+        Returns:
+            Dictionary with 'category' and 'action_items', or None on failure
+        """
+        categorization_prompt = self.db.get_prompt("categorization")
+        action_prompt = self.db.get_prompt("action_extraction")
+        if not categorization_prompt or not action_prompt:
+            return None
+        
+        analysis = self.llm.analyze_email(
+            self._email_content(email),
+            categorization_prompt.prompt_text,
+            action_prompt.prompt_text
+        )
+        
+        if analysis and analysis["category"]:
+            self._log_processing(
+                email.id,
+                "analysis",
+                "success",
+                llm_response=f"Category: {analysis['category']}, Actions: {len(analysis['action_items'])}"
+            )
+            return analysis
+        
+        self._log_processing(email.id, "analysis", "failed", error="LLM returned no analysis")
+        return None
+    
     def _categorize_email(self, email: Email) -> Optional[str]:
         """
         Categorize email using LLM.
         
+        Only reached after process_email's rule and local checks fell through,
+        so it goes straight to the model.
+        
         Args:
             email: Email object to categorize
             
@@ -158,7 +502,7 @@ class EmailProcessor:
             return None
         
         # Build email content string
-        email_content = f"From: {email.sender}\nSubject: {email.subject}\n\n{email.body}"
+        email_content = self._email_content(email)
         
         # Call LLM
         category = self.llm.categorize_email(email_content, prompt_obj.prompt_text)
@@ -197,7 +541,7 @@ class EmailProcessor:
             return []
         
         # Build email content string
-        email_content = f"From: {email.sender}\nSubject: {email.subject}\n\n{email.body}"
+        email_content = self._email_content(email)
         
         # Call LLM
         action_items = self.llm.extract_action_items(email_content, prompt_obj.prompt_text)
@@ -219,6 +563,11 @@ class EmailProcessor:
         
         return action_items
     
+    @staticmethod
+    def _email_content(email: Email) -> str:
+        """Format an email as LLM input."""
+        return f"From: {email.sender}\nSubject: {email.subject}\n\n{email.body}"
+    
     def _log_processing(
         self,
         email_id: int,
@@ -228,7 +577,7 @@ class EmailProcessor:
         error: str = None
     ):
         """
-        Log processing operation to database.
+        Log processing operation to database (buffered, written in bulk).
         
         Args:
             email_id: Email being processed
@@ -247,10 +596,7 @@ class EmailProcessor:
             timestamp=datetime.utcnow()
         )
         
-        try:
-            self.db.insert_log(log)
-        except Exception as e:
-            logger.error(f"Failed to insert processing log: {e}")
+        self.log_sink.write(log)
 
 
 # Singleton processor instance
@@ -0,0 +1,101 @@
+"""Hashed character n-gram features for local text classification."""
+from typing import List
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - numba is optional
+    njit = None
+
+FEATURE_DIM = 2048
+NGRAM_SIZE = 3
+
+_FNV_OFFSET = np.uint64(14695981039346656037)
+_FNV_PRIME = np.uint64(1099511628211)
+
+
+def _hash_ngrams_numpy(codes: np.ndarray, n: int, dim: int) -> np.ndarray:
+    """Signed counts of FNV-1a hashed byte n-grams, vectorized over positions."""
+    vector = np.zeros(dim, dtype=np.float32)
+    count = codes.shape[0] - n + 1
+    if count <= 0:
+        return vector
+    
+    hashes = np.full(count, _FNV_OFFSET, dtype=np.uint64)
+    for k in range(n):
+        hashes ^= codes[k:k + count].astype(np.uint64)
+        hashes *= _FNV_PRIME
+    
+    signs = np.where(hashes >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+    np.add.at(vector, (hashes % np.uint64(dim)).astype(np.int64), signs)
+    return vector
+
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def hash_ngrams(codes, n, dim):
+        """Numba kernel equivalent to _hash_ngrams_numpy; releases the GIL."""
+        vector = np.zeros(dim, dtype=np.float32)
+        for i in range(codes.shape[0] - n + 1):
+            h = np.uint64(14695981039346656037)
+            for k in range(n):
+                h = (h ^ np.uint64(codes[i + k])) * np.uint64(1099511628211)
+            vector[h % np.uint64(dim)] += 1.0 if h >> np.uint64(63) else -1.0
+        return vector
+    
+    # Compile once at import so the first email doesn't pay JIT latency
+    hash_ngrams(np.zeros(NGRAM_SIZE, dtype=np.uint8), NGRAM_SIZE, FEATURE_DIM)
+else:
+    hash_ngrams = _hash_ngrams_numpy
+
+
+def text_features(text: str) -> np.ndarray:
+    """
+    Featurize text as an L2-normalized signed hash of character n-grams.
+    
+    Args:
+        text: Text to featurize
+        
+    Returns:
+        float32 vector of shape (FEATURE_DIM,)
+    """
+    codes = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8)
+    vector = hash_ngrams(codes, NGRAM_SIZE, FEATURE_DIM)
+    
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def batch_text_features(texts: List[str]) -> np.ndarray:
+    """
+    Featurize many texts into one matrix.
+    
+    Args:
+        texts: Texts to featurize
+        
+    Returns:
+        float32 matrix of shape (len(texts), FEATURE_DIM) with L2-normalized rows
+    """
+    matrix = np.zeros((len(texts), FEATURE_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        codes = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8)
+        matrix[row] = hash_ngrams(codes, NGRAM_SIZE, FEATURE_DIM)
+    
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def quantize_rows(matrix: np.ndarray) -> tuple:
+    """
+    Quantize each row of a matrix to int8 with its own symmetric scale.
+    
+    Returns:
+        Tuple of (int8 matrix, float32 scales) where row ~= int8 row * scale
+    """
+    max_abs = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales
@@ -0,0 +1,59 @@
+"""Running latency estimates for adaptive request timeouts."""
+import threading
+from typing import Dict, Hashable
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted moving average of request latency per bucket.
+    
+    Buckets separate requests whose latency legitimately differs (e.g. by
+    output token budget), so a long reply doesn't inflate the deadline for
+    a one-word categorization.
+    """
+    
+    def __init__(self, alpha: float = 0.2, min_samples: int = 3, multiplier: float = 4.0):
+        """
+        Initialize tracker.
+        
+        Args:
+            alpha: Weight of the newest sample in the moving average
+            min_samples: Samples needed in a bucket before its timeout adapts
+            multiplier: Timeout as a multiple of the average latency
+        """
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self._lock = threading.Lock()
+        self._averages: Dict[Hashable, float] = {}
+        self._counts: Dict[Hashable, int] = {}
+    
+    def observe(self, bucket: Hashable, seconds: float):
+        """
+        Record the latency of a successful request.
+        
+        Args:
+            bucket: Request class the sample belongs to
+            seconds: Observed latency
+        """
+        with self._lock:
+            average = self._averages.get(bucket)
+            self._averages[bucket] = seconds if average is None else average + self.alpha * (seconds - average)
+            self._counts[bucket] = self._counts.get(bucket, 0) + 1
+    
+    def timeout(self, bucket: Hashable, floor: float, ceiling: float) -> float:
+        """
+        Deadline for the next request in a bucket.
+        
+        Args:
+            bucket: Request class
+            floor: Minimum timeout in seconds
+            ceiling: Maximum timeout in seconds (used until enough samples exist)
+        
+        Returns:
+            multiplier x average latency, clamped to [floor, ceiling]
+        """
+        with self._lock:
+            if self._counts.get(bucket, 0) < self.min_samples:
+                return ceiling
+            return min(ceiling, max(floor, self.multiplier * self._averages[bucket]))
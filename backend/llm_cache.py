@@ -0,0 +1,247 @@
+"""Exact + semantic cache for raw LLM completions."""
+import functools
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from backend.config import config
+from backend.database import db, Database
+from backend.serialization import json_dumps
+from backend.semantic_cache import EMBEDDING_DIM, embed_text, quantize, _masked_scores
+
+# Set up logging (handlers are configured by the application entry point)
+logger = logging.getLogger(__name__)
+
+
+def _digest(payload: Any) -> bytes:
+    """Stable 16-byte digest of a JSON-serializable payload."""
+    encoded = json_dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM completions.
+    
+    The exact tier is an LRU keyed by a digest of the full request, backed
+    by a SQLite table so repeat emails skip the LLM across runs too. The
+    optional semantic tier matches the last user message by embedding
+    similarity among requests that share everything else (system prompt,
+    earlier turns and sampling parameters).
+    
+    Prompt edits invalidate entries naturally: the prompt text is part of
+    the digested request.
+    """
+    
+    def __init__(
+        self,
+        provider: str = "",
+        maxsize: int = None,
+        semantic_enabled: bool = None,
+        semantic_threshold: float = None,
+        database: Optional[Database] = None,
+        persist: bool = None,
+        ttl_seconds: int = None
+    ):
+        """
+        Initialize cache.
+        
+        Args:
+            provider: LLM backend the completions come from; part of every key,
+                so persisted answers from one provider are never served by another
+            maxsize: Maximum entries per tier
+            semantic_enabled: Whether to match paraphrased requests
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            database: Database used to persist exact entries
+            persist: Whether exact entries are persisted
+            ttl_seconds: Lifetime of persisted entries
+        """
+        self.provider = provider
+        self.maxsize = maxsize if maxsize is not None else config.LLM_CACHE_MAXSIZE
+        self.semantic_enabled = (
+            semantic_enabled if semantic_enabled is not None else config.LLM_SEMANTIC_CACHE_ENABLED
+        )
+        self.semantic_threshold = (
+            semantic_threshold if semantic_threshold is not None else config.LLM_SEMANTIC_CACHE_THRESHOLD
+        )
+        persist = persist if persist is not None else config.LLM_CACHE_PERSIST
+        self.db = (database or db) if persist else None
+        self.ttl = timedelta(seconds=ttl_seconds if ttl_seconds is not None else config.LLM_CACHE_TTL_SECONDS)
+        self.hits = 0
+        self.misses = 0
+        self._pruned = False
+        self._lock = threading.Lock()
+        self._exact: "OrderedDict[bytes, str]" = OrderedDict()
+        self._embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._partitions = np.empty(0, dtype=np.int64)
+        self._responses: List[str] = []
+    
+    def get(self, messages: List[Dict[str, str]], **params) -> Optional[str]:
+        """
+        Look up a cached completion.
+        
+        Args:
+            messages: Chat messages of the request
+            **params: Sampling parameters of the request
+        
+        Returns:
+            Cached response or None on miss
+        """
+        key = self._key(messages, params)
+        with self._lock:
+            response = self._exact.get(key)
+            if response is not None:
+                self._exact.move_to_end(key)
+                self.hits += 1
+                return response
+        
+        response = self._load_persisted(key)
+        
+        with self._lock:
+            if response is not None:
+                self._remember(key, response)
+                self.hits += 1
+                return response
+            
+            if self.semantic_enabled and self._responses:
+                query_vector, query_scale = quantize(embed_text(self._last_user_content(messages)))
+                scores = _masked_scores(
+                    self._embeddings, self._scales, self._partitions,
+                    query_vector, query_scale, self._partition(messages, params)
+                )
+                best = int(np.argmax(scores))
+                if scores[best] >= self.semantic_threshold:
+                    logger.debug("LLM semantic cache hit (similarity %.3f)", scores[best])
+                    self.hits += 1
+                    return self._responses[best]
+            
+            self.misses += 1
+        
+        return None
+    
+    def put(self, messages: List[Dict[str, str]], response: str, **params):
+        """
+        Store a completion.
+        
+        Args:
+            messages: Chat messages of the request
+            response: LLM response text
+            **params: Sampling parameters of the request
+        """
+        key = self._key(messages, params)
+        if self.db is not None:
+            try:
+                self.db.put_llm_cached_response(key, response, datetime.utcnow())
+            except Exception as e:
+                logger.error(f"Failed to persist LLM response: {e}")
+        
+        with self._lock:
+            self._remember(key, response)
+            
+            if not self.semantic_enabled:
+                return
+            
+            quantized, scale = quantize(embed_text(self._last_user_content(messages)))
+            self._embeddings = np.vstack([self._embeddings, quantized.reshape(1, EMBEDDING_DIM)])
+            self._scales = np.append(self._scales, scale)
+            self._partitions = np.append(self._partitions, self._partition(messages, params))
+            self._responses.append(response)
+            
+            overflow = len(self._responses) - self.maxsize
+            if overflow > 0:
+                self._embeddings = self._embeddings[overflow:]
+                self._scales = self._scales[overflow:]
+                self._partitions = self._partitions[overflow:]
+                self._responses = self._responses[overflow:]
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and in-memory size of the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._exact)}
+    
+    def clear(self):
+        """Drop all in-memory completions (persisted rows expire via TTL)."""
+        with self._lock:
+            self._exact.clear()
+            self._embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+            self._scales = np.empty(0, dtype=np.float32)
+            self._partitions = np.empty(0, dtype=np.int64)
+            self._responses = []
+    
+    def _remember(self, key: bytes, response: str):
+        """Insert into the exact LRU tier (caller holds the lock)."""
+        self._exact[key] = response
+        self._exact.move_to_end(key)
+        if len(self._exact) > self.maxsize:
+            self._exact.popitem(last=False)
+    
+    def _load_persisted(self, key: bytes) -> Optional[str]:
+        """Look up a persisted completion, pruning expired rows on first use."""
+        if self.db is None:
+            return None
+        
+        cutoff = datetime.utcnow() - self.ttl
+        try:
+            if not self._pruned:
+                self._pruned = True
+                self.db.delete_llm_cached_responses(cutoff)
+            return self.db.get_llm_cached_response(key, cutoff)
+        except Exception as e:
+            logger.error(f"Failed to read persisted LLM response: {e}")
+            return None
+    
+    def _key(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> bytes:
+        """Exact-tier key: digest of the provider and the full request."""
+        return _digest([self.provider, messages, params])
+    
+    @staticmethod
+    def _last_user_content(messages: List[Dict[str, str]]) -> str:
+        """Content of the last user message (the part matched semantically)."""
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return message.get("content", "")
+        return ""
+    
+    @staticmethod
+    def _partition(messages: List[Dict[str, str]], params: Dict[str, Any]) -> int:
+        """Signed 64-bit key for everything in the request except the last user message."""
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=len(messages))
+        context = [m for i, m in enumerate(messages) if i != last_user]
+        return int.from_bytes(_digest([context, params])[:8], "little", signed=True)
+
+
+def cached_llm(call):
+    """
+    Decorate a service's _call_llm with its response_cache.
+    
+    Caching is opt-in per call (cache=True): only the processing calls whose
+    answer should not change between identical requests (categorization,
+    action extraction, analysis) use it. Generative calls such as drafts and
+    agent answers must stay fresh, so regenerating gives a new reply.
+    Streaming requests and failed (None/empty) responses are never cached,
+    nor are responses rejected by the optional validate callback, so a
+    malformed completion is retried next time instead of replayed.
+    """
+    @functools.wraps(call)
+    def wrapper(self, messages, temperature=0.7, max_tokens=1000, stream=False, cache=False, validate=None, **kwargs):
+        response_cache = getattr(self, "response_cache", None)
+        if stream or not cache or response_cache is None:
+            return call(self, messages, temperature, max_tokens, stream, **kwargs)
+        
+        params = dict(kwargs, model=self.model, temperature=temperature, max_tokens=max_tokens)
+        cached = response_cache.get(messages, **params)
+        if cached is not None:
+            return cached
+        
+        response = call(self, messages, temperature, max_tokens, stream, **kwargs)
+        if response and (validate is None or validate(response)):
+            response_cache.put(messages, response, **params)
+        return response
+    
+    return wrapper
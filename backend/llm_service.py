@@ -1,47 +1,130 @@
 """OpenAI LLM service integration."""
 import logging
 import time
-import json
+from importlib.util import find_spec
 from typing import Optional, List, Dict, Any, Generator
 from openai import OpenAI, APIError, APITimeoutError, RateLimitError
+from pydantic import ValidationError
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx ships with openai
+    httpx = None
 
 from backend.config import config
+from backend.llm_cache import LLMResponseCache, cached_llm
+from backend.models import ActionItemList, EmailAnalysis
+from backend.prompt_templates import (
+    VALID_CATEGORIES, split_prompt_template, build_analysis_prompt, build_batch_categorization_prompt,
+    format_email_batch, parse_category
+)
+from backend.serialization import json_loads, json_dumps, parse_embedded_json_array
+from backend.token_budget import trim_history, truncate_to_tokens
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+ACTION_ITEMS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "action_items",
+        "schema": ActionItemList.model_json_schema(),
+        "strict": True
+    }
+}
+
+CATEGORY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "email_category",
+        "schema": {
+            "type": "object",
+            "properties": {"category": {"type": "string", "enum": VALID_CATEGORIES}},
+            "required": ["category"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+EMAIL_ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "email_analysis",
+        "schema": EmailAnalysis.model_json_schema(),
+        "strict": True
+    }
+}
+
 
 class LLMService:
     """OpenAI LLM service manager with retry logic and error handling."""
     
     def __init__(self):
         """Initialize OpenAI client."""
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
         self.model = config.OPENAI_MODEL
         self.max_retries = config.MAX_RETRIES
         self.timeout = config.TIMEOUT_SECONDS
+        self.client = OpenAI(api_key=config.OPENAI_API_KEY, http_client=self._build_http_client())
         self.total_tokens_used = 0
+        self.structured_outputs = config.OPENAI_STRUCTURED_OUTPUTS
+        self.response_cache = LLMResponseCache("openai") if config.LLM_CACHE_ENABLED else None
+    
+    def _build_http_client(self):
+        """
+        Build a pooled keep-alive HTTP client for the OpenAI SDK.
+        
+        Concurrent batch requests reuse warm TLS connections, and are
+        multiplexed over one socket with HTTP/2 when the h2 package is
+        installed (pip install httpx[http2]).
+        
+        Returns:
+            httpx.Client, or None to let the SDK use its default client
+        """
+        if httpx is None:
+            return None
+        
+        return httpx.Client(
+            http2=find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=64),
+            timeout=self.timeout
+        )
     
+    def close(self):
+        """Close pooled HTTP connections."""
+        self.client.close()
+    
+    @cached_llm
     def _call_llm(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        stream: bool = False
+        stream: bool = False,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> Optional[str]:
         """
         Call OpenAI API with retry logic.
         
+        With cache=True (set by the deterministic processing calls), the
+        response is served from response_cache when an identical (or, if
+        enabled, semantically similar) request was seen. A validate callback
+        decides which responses are good enough to be stored.
+        
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
             stream: Whether to stream response
+            response_format: Optional structured output format
             
         Returns:
             LLM response text or None on failure
         """
+        extra_params = {}
+        if response_format:
+            extra_params["response_format"] = response_format
+        
         for attempt in range(self.max_retries):
             try:
                 response = self.client.chat.completions.create(
@@ -50,7 +133,8 @@ class LLMService:
                     temperature=temperature,
                     max_tokens=max_tokens,
                     timeout=self.timeout,
-                    stream=stream
+                    stream=stream,
+                    **extra_params
                 )
                 
                 if stream:
@@ -59,7 +143,10 @@ class LLMService:
                 # Track token usage
                 if hasattr(response, 'usage') and response.usage:
                     self.total_tokens_used += response.usage.total_tokens
-                    logger.info(f"Tokens used: {response.usage.total_tokens} (Total: {self.total_tokens_used})")
+                    logger.info("Tokens used: %d (Total: %d)", response.usage.total_tokens, self.total_tokens_used)
+                    details = getattr(response.usage, 'prompt_tokens_details', None)
+                    if details and details.cached_tokens:
+                        logger.debug("Prompt tokens served from cache: %d", details.cached_tokens)
                 
                 return response.choices[0].message.content
                 
@@ -104,28 +191,46 @@ class LLMService:
         Returns:
             Category name or None on failure
         """
-        prompt = categorization_prompt.format(email_content=email_content)
+        response = self._call_llm(
+            cache=True,
+            validate=lambda text: self._parse_category(text) is not None,
+            **self._categorization_request(email_content, categorization_prompt)
+        )
+        return self._parse_category(response)
+    
+    def categorize_emails_batch(
+        self,
+        email_contents: List[str],
+        categorization_prompt: str
+    ) -> Optional[List[Optional[str]]]:
+        """
+        Categorize several emails with a single LLM call.
+        
+        Args:
+            email_contents: Emails to categorize
+            categorization_prompt: Prompt template for categorization
+            
+        Returns:
+            Category per email in input order, or None if the response could
+            not be matched to the emails (callers should split and retry)
+        """
         messages = [
-            {"role": "system", "content": "You are an email classification expert. Respond with ONLY the category name."},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": build_batch_categorization_prompt(categorization_prompt)},
+            {"role": "user", "content": format_email_batch(email_contents)}
         ]
         
+        def all_categorized(text: str) -> bool:
+            categories = self._parse_category_batch(text, len(email_contents))
+            return categories is not None and None not in categories
+        
         response = self._call_llm(
             messages=messages,
             temperature=config.CATEGORIZATION_TEMPERATURE,
-            max_tokens=50
+            max_tokens=10 * len(email_contents) + 10,
+            cache=True,
+            validate=all_categorized
         )
-        
-        if response:
-            # Extract category from response (handle extra text)
-            category = response.strip()
-            valid_categories = ["Important", "Newsletter", "Spam", "To-Do"]
-            for cat in valid_categories:
-                if cat.lower() in category.lower():
-                    return cat
-            return category
-        
-        return None
+        return self._parse_category_batch(response, len(email_contents))
     
     def extract_action_items(
         self,
@@ -142,17 +247,140 @@ class LLMService:
         Returns:
             List of action item dictionaries
         """
-        prompt = action_prompt.format(email_content=email_content)
+        response = self._call_llm(
+            cache=True,
+            validate=lambda text: self._decode_action_items(text) is not None,
+            **self._action_extraction_request(email_content, action_prompt)
+        )
+        return self._parse_action_items(response)
+    
+    def analyze_email(
+        self,
+        email_content: str,
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Categorize email and extract action items in a single LLM call.
+        
+        Args:
+            email_content: Email to analyze
+            categorization_prompt: Prompt template for categorization
+            action_prompt: Prompt template for action extraction
+            
+        Returns:
+            Dictionary with 'category' and 'action_items', or None on failure
+        """
         messages = [
-            {"role": "system", "content": "You are an expert at extracting actionable tasks from emails. Always respond with valid JSON."},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": build_analysis_prompt(categorization_prompt, action_prompt)},
+            {"role": "user", "content": email_content}
         ]
         
         response = self._call_llm(
             messages=messages,
-            temperature=config.ACTION_EXTRACTION_TEMPERATURE,
-            max_tokens=500
+            temperature=config.CATEGORIZATION_TEMPERATURE,
+            max_tokens=550,
+            cache=True,
+            validate=lambda text: self._parse_analysis(text) is not None,
+            response_format=EMAIL_ANALYSIS_RESPONSE_FORMAT if self.structured_outputs else {"type": "json_object"}
         )
+        return self._parse_analysis(response)
+    
+    def _categorization_request(self, email_content: str, categorization_prompt: str) -> Dict[str, Any]:
+        """Build _call_llm arguments for categorization."""
+        request = {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an email classification expert. Respond with ONLY the category name.\n\n"
+                               + split_prompt_template(categorization_prompt)
+                },
+                {"role": "user", "content": email_content}
+            ],
+            "temperature": config.CATEGORIZATION_TEMPERATURE,
+            "max_tokens": 10
+        }
+        if self.structured_outputs:
+            # Constrain the answer to exactly one label instead of trusting free text
+            request["response_format"] = CATEGORY_RESPONSE_FORMAT
+            request["max_tokens"] = 20
+        return request
+    
+    def _action_extraction_request(self, email_content: str, action_prompt: str) -> Dict[str, Any]:
+        """Build _call_llm arguments for action item extraction."""
+        request = {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert at extracting actionable tasks from emails. Always respond with valid JSON.\n\n"
+                               + split_prompt_template(action_prompt)
+                },
+                {"role": "user", "content": email_content}
+            ],
+            "temperature": config.ACTION_EXTRACTION_TEMPERATURE,
+            "max_tokens": 500
+        }
+        if self.structured_outputs:
+            request["response_format"] = ACTION_ITEMS_RESPONSE_FORMAT
+        return request
+    
+    def _parse_category(self, response: Optional[str]) -> Optional[str]:
+        """Normalize a categorization response (a label or CATEGORY_RESPONSE_FORMAT JSON) to a category name."""
+        if response and self.structured_outputs and response.lstrip().startswith("{"):
+            try:
+                response = json_loads(response).get("category")
+            except (ValueError, AttributeError) as e:
+                logger.warning(f"Failed to parse category response: {e}")
+                return None
+        return parse_category(response)
+    
+    def _parse_category_batch(self, response: Optional[str], count: int) -> Optional[List[Optional[str]]]:
+        """Parse a batched categorization response, or None unless it holds one label per email."""
+        try:
+            labels = parse_embedded_json_array(response) if response else None
+        except ValueError as e:
+            logger.warning(f"Failed to parse batched categories: {e}")
+            return None
+        
+        if labels is None or len(labels) != count:
+            return None
+        return [self._parse_category(str(label)) if label else None for label in labels]
+    
+    def _parse_analysis(self, response: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Parse an analysis response, or None if it is malformed or names no valid category."""
+        if not response:
+            return None
+        
+        try:
+            analysis = EmailAnalysis.model_validate_json(response)
+        except ValidationError as e:
+            logger.error(f"Email analysis response failed validation: {e}")
+            return None
+        
+        category = self._parse_category(analysis.category)
+        if not category:
+            logger.warning(f"Email analysis returned an unknown category: {analysis.category!r}")
+            return None
+        
+        return {
+            "category": category,
+            "action_items": [item.model_dump() for item in analysis.action_items]
+        }
+    
+    def _parse_action_items(self, response: Optional[str]) -> List[Dict[str, Any]]:
+        """Parse an action extraction response into action item dictionaries."""
+        action_items = self._decode_action_items(response)
+        return action_items if action_items is not None else []
+    
+    def _decode_action_items(self, response: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Decode an action extraction response, or None if it holds no parseable action items."""
+        if response and self.structured_outputs:
+            # Schema-constrained sampling guarantees the shape; validation only guards truncation
+            try:
+                return [item.model_dump() for item in ActionItemList.model_validate_json(response).items]
+            except ValidationError as e:
+                logger.error(f"Structured action items failed validation: {e}")
+                return None
         
         if response:
             try:
@@ -160,24 +388,114 @@ class LLMService:
                 # Handle cases where response might have extra text
                 response = response.strip()
                 
-                # Find JSON array in response
-                start_idx = response.find('[')
-                end_idx = response.rfind(']')
-                
-                if start_idx != -1 and end_idx != -1:
-                    json_str = response[start_idx:end_idx + 1]
-                    action_items = json.loads(json_str)
-                    return action_items if isinstance(action_items, list) else []
-                else:
+                # Find JSON array in response (keeps the complete items of a truncated array)
+                action_items = parse_embedded_json_array(response)
+                if action_items is None:
                     logger.warning("No JSON array found in action extraction response")
-                    return []
+                return action_items
                     
-            except json.JSONDecodeError as e:
+            except ValueError as e:
                 logger.error(f"Failed to parse action items JSON: {e}")
                 logger.error(f"Response was: {response}")
-                return []
+                return None
         
-        return []
+        return None
+    
+    def submit_analysis_batch(
+        self,
+        emails: Dict[int, str],
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[str]:
+        """
+        Submit categorization and action extraction for many emails to the Batch API.
+        
+        Batch requests are billed at half price and don't count against the
+        real-time rate limit, but complete asynchronously (within 24h).
+        
+        Args:
+            emails: Mapping of email ID to email content
+            categorization_prompt: Prompt template for categorization
+            action_prompt: Prompt template for action extraction
+            
+        Returns:
+            Batch ID or None on failure
+        """
+        lines = []
+        for email_id, email_content in emails.items():
+            for operation, request in (
+                ("categorization", self._categorization_request(email_content, categorization_prompt)),
+                ("action_extraction", self._action_extraction_request(email_content, action_prompt))
+            ):
+                lines.append(json_dumps({
+                    "custom_id": f"{email_id}:{operation}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": self.model, **request}
+                }))
+        
+        try:
+            batch_file = self.client.files.create(
+                file=("email_analysis.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Submitted batch {batch.id} with {len(lines)} requests")
+            return batch.id
+        except Exception as e:
+            logger.error(f"Failed to submit batch: {e}")
+            return None
+    
+    def get_analysis_batch_results(self, batch_id: str) -> Optional[Dict[int, Dict[str, Any]]]:
+        """
+        Fetch results of a batch submitted with submit_analysis_batch.
+        
+        Args:
+            batch_id: Batch ID returned by submit_analysis_batch
+            
+        Returns:
+            Mapping of email ID to {"category", "action_items"} once the batch
+            has finished (empty if it failed), or None while it is still running
+        """
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+                return None
+            
+            if batch.status != "completed" or not batch.output_file_id:
+                logger.error(f"Batch {batch_id} ended with status {batch.status}")
+                return {}
+            
+            output = self.client.files.content(batch.output_file_id).text
+        except Exception as e:
+            logger.error(f"Failed to retrieve batch {batch_id}: {e}")
+            return None
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            
+            record = json_loads(line)
+            email_id, operation = record["custom_id"].split(":", 1)
+            body = (record.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            content = choices[0]["message"]["content"] if choices else None
+            
+            if body.get("usage"):
+                self.total_tokens_used += body["usage"].get("total_tokens", 0)
+            
+            result = results.setdefault(int(email_id), {"category": None, "action_items": []})
+            if operation == "categorization":
+                result["category"] = self._parse_category(content)
+            else:
+                result["action_items"] = self._parse_action_items(content)
+        
+        return results
     
     def generate_reply(
         self,
@@ -198,14 +516,17 @@ class LLMService:
         Returns:
             Draft reply text or None on failure
         """
-        prompt = reply_prompt.format(email_content=email_content)
-        
+        user_content = email_content
         if user_instruction:
-            prompt += f"\n\nAdditional Instructions: {user_instruction}"
+            user_content += f"\n\nAdditional Instructions: {user_instruction}"
         
         messages = [
-            {"role": "system", "content": "You are a professional email assistant. Write clear, concise, and appropriate email responses."},
-            {"role": "user", "content": prompt}
+            {
+                "role": "system",
+                "content": "You are a professional email assistant. Write clear, concise, and appropriate email responses.\n\n"
+                           + split_prompt_template(reply_prompt)
+            },
+            {"role": "user", "content": user_content}
         ]
         
         response = self._call_llm(
@@ -235,32 +556,7 @@ class LLMService:
         Returns:
             Agent response or None on failure
         """
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are an intelligent email productivity assistant. "
-                    "Help users manage their inbox, understand emails, and draft responses. "
-                    "Be concise, helpful, and professional. "
-                    "If you reference specific emails, cite them clearly."
-                )
-            }
-        ]
-        
-        # Add conversation history (last N messages)
-        if conversation_history:
-            history_limit = config.MAX_CONVERSATION_HISTORY
-            messages.extend(conversation_history[-history_limit:])
-        
-        # Build context-aware query
-        full_query = query
-        if email_context:
-            full_query = f"Email Context:\n{email_context}\n\nUser Query: {query}"
-        
-        if prompt_context:
-            full_query += f"\n\nPrompt Configuration: {prompt_context}"
-        
-        messages.append({"role": "user", "content": full_query})
+        messages = self._build_query_messages(query, email_context, prompt_context, conversation_history)
         
         response = self._call_llm(
             messages=messages,
@@ -287,42 +583,72 @@ class LLMService:
         Yields:
             Response chunks as they arrive
         """
+        messages = self._build_query_messages(query, email_context, None, conversation_history)
+        
+        try:
+            stream = self._call_llm(
+                messages=messages,
+                temperature=config.AGENT_RESPONSE_TEMPERATURE,
+                max_tokens=1000,
+                stream=True
+            )
+            
+            if stream:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                        
+        except Exception as e:
+            logger.error(f"Streaming error: {e}")
+    
+    def _build_query_messages(
+        self,
+        query: str,
+        email_context: Optional[str] = None,
+        prompt_context: Optional[str] = None,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build chat messages for an agent query.
+        
+        Args:
+            query: User's question or request
+            email_context: Relevant email content for context
+            prompt_context: Additional prompt configuration context
+            conversation_history: Previous messages in conversation
+            
+        Returns:
+            List of message dictionaries
+        """
         messages = [
             {
                 "role": "system",
                 "content": (
                     "You are an intelligent email productivity assistant. "
-                    "Help users manage their inbox efficiently."
+                    "Help users manage their inbox, understand emails, and draft responses. "
+                    "Be concise, helpful, and professional. "
+                    "If you reference specific emails, cite them clearly."
                 )
             }
         ]
         
+        # Add conversation history (last N messages within the token budget)
         if conversation_history:
-            history_limit = config.MAX_CONVERSATION_HISTORY
-            messages.extend(conversation_history[-history_limit:])
+            messages.extend(trim_history(
+                conversation_history, config.MAX_HISTORY_TOKENS, config.MAX_CONVERSATION_HISTORY
+            ))
         
+        # Build context-aware query
         full_query = query
         if email_context:
+            email_context = truncate_to_tokens(email_context, config.MAX_CONTEXT_TOKENS)
             full_query = f"Email Context:\n{email_context}\n\nUser Query: {query}"
         
-        messages.append({"role": "user", "content": full_query})
+        if prompt_context:
+            full_query += f"\n\nPrompt Configuration: {prompt_context}"
         
-        try:
-            stream = self._call_llm(
-                messages=messages,
-                temperature=config.AGENT_RESPONSE_TEMPERATURE,
-                max_tokens=1000,
-                stream=True
-            )
-            
-            if stream:
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-                        
-        except Exception as e:
-            logger.error(f"Streaming error: {e}")
-            yield f"Error: {str(e)}"
+        messages.append({"role": "user", "content": full_query})
+        return messages
     
     def get_token_usage(self) -> int:
         """Get total tokens used in this session."""
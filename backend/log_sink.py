@@ -0,0 +1,98 @@
+"""Buffered writer for processing logs."""
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Deque, Optional
+
+from backend.database import db, Database
+from backend.models import ProcessingLog
+
+# Set up logging (handlers are configured by the application entry point)
+logger = logging.getLogger(__name__)
+
+
+class LogSink:
+    """
+    Buffer processing logs in memory and write them in bulk.
+    
+    A background thread flushes every flush_interval seconds, or sooner once
+    batch_size logs are waiting or a failure is logged, so a batch run commits
+    one transaction per batch of logs instead of one per log line and the
+    processing threads never wait on the SQLite write lock to log.
+    """
+    
+    def __init__(
+        self,
+        database: Database = None,
+        flush_interval: float = 1.0,
+        batch_size: int = 100
+    ):
+        """
+        Initialize sink.
+        
+        Args:
+            database: Database logs are written to
+            flush_interval: Maximum seconds a log waits before being written
+            batch_size: Buffered logs that trigger an early flush
+        """
+        self.db = database or db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer: Deque[ProcessingLog] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+    
+    def write(self, log: ProcessingLog):
+        """
+        Queue a log for writing without blocking on the database.
+        
+        Failures wake the background thread so they are written right away,
+        but never on the caller's thread.
+        
+        Args:
+            log: Processing log to store
+        """
+        self._buffer.append(log)
+        
+        self._ensure_worker()
+        if log.status == "failed" or len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+    
+    def flush(self):
+        """Write all buffered logs in one transaction."""
+        with self._lock:
+            logs = []
+            while self._buffer:
+                logs.append(self._buffer.popleft())
+            
+            if not logs:
+                return
+            
+            try:
+                self.db.insert_logs_bulk(logs)
+            except Exception as e:
+                logger.error(f"Failed to insert {len(logs)} processing logs: {e}")
+    
+    def _ensure_worker(self):
+        """Start the background flush thread on first use."""
+        if self._worker is not None:
+            return
+        
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._worker.start()
+                atexit.register(self.flush)
+    
+    def _run(self):
+        """Flush periodically, or early when the buffer fills up."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+# Singleton log sink instance
+log_sink = LogSink()
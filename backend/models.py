@@ -1,11 +1,15 @@
 """Data models for Email Productivity Agent."""
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple, Literal
 import json
 
+from pydantic import BaseModel, ConfigDict
 
-@dataclass
+from backend.serialization import parse_datetime
+
+
+@dataclass(slots=True)
 class Email:
     """Email data model."""
     id: int
@@ -39,11 +43,11 @@ class Email:
         """Create Email from dictionary."""
         timestamp = data.get("timestamp")
         if isinstance(timestamp, str):
-            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            timestamp = parse_datetime(timestamp)
         
-        created_at = data.get("created_at", datetime.utcnow())
+        created_at = data.get("created_at") or datetime.utcnow()
         if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            created_at = parse_datetime(created_at)
         
         return Email(
             id=data["id"],
@@ -59,7 +63,40 @@ class Email:
         )
 
 
-@dataclass
+class ActionItem(BaseModel):
+    """Action item schema for structured LLM output."""
+    model_config = ConfigDict(extra="forbid")
+    
+    task: str
+    deadline: Optional[str]
+    priority: Literal["high", "medium", "low"]
+
+
+class ActionItemList(BaseModel):
+    """Structured output wrapper (response schemas must have an object root)."""
+    model_config = ConfigDict(extra="forbid")
+    
+    items: List[ActionItem]
+
+
+class EmailAnalysis(BaseModel):
+    """Combined categorization + action extraction schema for structured LLM output."""
+    model_config = ConfigDict(extra="forbid")
+    
+    category: str
+    action_items: List[ActionItem]
+
+
+class EmailHeader(NamedTuple):
+    """Lightweight email row for list views (timestamp kept as stored ISO string)."""
+    id: int
+    sender: str
+    subject: str
+    category: Optional[str]
+    timestamp: str
+
+
+@dataclass(slots=True)
 class Prompt:
     """Prompt template data model."""
     id: Optional[int]
@@ -81,7 +118,7 @@ class Prompt:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Draft:
     """Draft email data model."""
     id: Optional[int]
@@ -103,7 +140,7 @@ class Draft:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingLog:
     """Processing log data model."""
     id: Optional[int]
@@ -127,7 +164,7 @@ class ProcessingLog:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentMessage:
     """Agent conversation message."""
     role: str  # 'user' or 'assistant'
@@ -2,99 +2,165 @@
 import logging
 import time
 import json
-import requests
+from importlib.util import find_spec
+import httpx
 from typing import Optional, List, Dict, Any, Generator
 
+from pydantic import ValidationError
+
 from backend.config import config
+from backend.latency_tracker import LatencyTracker
+from backend.llm_cache import LLMResponseCache, cached_llm
+from backend.models import ActionItemList, EmailAnalysis
+from backend.prompt_templates import (
+    build_analysis_prompt, build_batch_categorization_prompt, format_email_batch, parse_category,
+    split_prompt_template
+)
+from backend.serialization import json_dumps_bytes, json_loads, parse_embedded_json_array
+from backend.token_budget import trim_history, truncate_to_tokens
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+CATEGORIZATION_SYSTEM_PREFIX = "You are an email classification expert. Respond with ONLY the category name.\n\n"
+ACTION_EXTRACTION_SYSTEM_PREFIX = (
+    "You are an expert at extracting actionable tasks from emails. Always respond with valid JSON.\n\n"
+)
+# Grammar-constrained output for action extraction and combined analysis (schemas need an object root)
+ACTION_ITEMS_FORMAT = ActionItemList.model_json_schema()
+EMAIL_ANALYSIS_FORMAT = EmailAnalysis.model_json_schema()
+
 
 class OllamaService:
     """Ollama LLM service manager - completely free local AI."""
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3.2",
+        keep_alive: str = "1h"
+    ):
         """
         Initialize Ollama client.
         
         Args:
             base_url: Ollama API endpoint
             model: Model name to use (llama3.2, mistral, etc.)
+            keep_alive: How long Ollama keeps the model (and its prompt KV cache) loaded
         """
         self.base_url = base_url
         self.model = model
+        self.keep_alive = keep_alive
+        self.structured_outputs = config.OLLAMA_STRUCTURED_OUTPUTS
         self.max_retries = 3
         self.timeout = 60
         self.total_tokens_used = 0
+        self._latency = LatencyTracker()
+        self._client = self._build_client()
+        self.response_cache = LLMResponseCache("ollama") if config.LLM_CACHE_ENABLED else None
+    
+    def _build_client(self) -> httpx.Client:
+        """
+        Build a pooled keep-alive HTTP client for Ollama.
+        
+        With the h2 package installed, requests to an HTTP/2 endpoint (e.g.
+        Ollama behind a TLS reverse proxy) are multiplexed over one connection;
+        a plain local Ollama keeps using HTTP/1.1 keep-alive. Retries are
+        handled by _call_llm.
+        """
+        return httpx.Client(
+            http2=find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=self.timeout,
+            # Request bodies are pre-encoded with orjson
+            headers={"Content-Type": "application/json"}
+        )
+    
+    def close(self):
+        """Close pooled HTTP connections."""
+        self._client.close()
     
+    @cached_llm
     def _call_llm(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        stream: bool = False
+        stream: bool = False,
+        response_format: Optional[Any] = None
     ) -> Optional[str]:
         """
         Call Ollama API with retry logic.
         
+        With cache=True (set by the deterministic processing calls), the
+        response is served from response_cache when an identical (or, if
+        enabled, semantically similar) request was seen. A validate callback
+        decides which responses are good enough to be stored.
+        
+        The first attempt times out at a few times the usual latency for
+        requests of this size, so a stalled request is retried early; retries
+        get the full configured timeout.
+        
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
             stream: Whether to stream response
+            response_format: Optional Ollama output format ("json" or a JSON schema)
             
         Returns:
             LLM response text or None on failure
         """
-        # Convert messages to Ollama format (simple prompt)
-        prompt = self._messages_to_prompt(messages)
-        
         for attempt in range(self.max_retries):
             try:
-                url = f"{self.base_url}/api/generate"
+                # Native chat endpoint: Ollama applies the model's own chat template
+                url = f"{self.base_url}/api/chat"
                 payload = {
                     "model": self.model,
-                    "prompt": prompt,
-                    "temperature": temperature,
+                    "messages": messages,
                     "stream": False,
+                    "keep_alive": self.keep_alive,
                     "options": {
-                        "num_predict": max_tokens
+                        "num_predict": max_tokens,
+                        "temperature": temperature
                     }
                 }
+                if response_format:
+                    payload["format"] = response_format
                 
-                response = requests.post(
+                timeout = self._latency.timeout(max_tokens, 5.0, self.timeout) if attempt == 0 else self.timeout
+                started = time.monotonic()
+                response = self._client.post(
                     url,
-                    json=payload,
-                    timeout=self.timeout
+                    content=json_dumps_bytes(payload),
+                    timeout=timeout
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    content = result.get("response", "")
+                    self._latency.observe(max_tokens, time.monotonic() - started)
+                    result = json_loads(response.content)
+                    content = result.get("message", {}).get("content", "")
                     
-                    # Estimate tokens (rough approximation)
-                    self.total_tokens_used += len(content.split()) * 1.3
+                    self._record_usage(result, len(content))
                     
                     return content
                 elif response.status_code == 404:
                     logger.error(f"Model '{self.model}' not found. Please run: ollama pull {self.model}")
                     return None
                 else:
-                    logger.warning(f"Ollama API returned status {response.status_code}")
+                    logger.warning("Ollama API returned status %s", response.status_code)
                     
-            except requests.exceptions.ConnectionError as e:
+            except httpx.ConnectError as e:
                 logger.error(f"Cannot connect to Ollama. Is it running? Error: {e}")
                 if attempt < self.max_retries - 1:
-                    logger.info("Retrying in 2 seconds...")
+                    logger.debug("Retrying in 2 seconds...")
                     time.sleep(2)
                 else:
                     logger.error("Please start Ollama: Run 'ollama serve' in terminal")
                     return None
                     
-            except requests.exceptions.Timeout as e:
-                logger.warning(f"Timeout (attempt {attempt + 1}/{self.max_retries}): {e}")
+            except httpx.TimeoutException as e:
+                logger.warning("Timeout (attempt %d/%d): %s", attempt + 1, self.max_retries, e)
                 if attempt < self.max_retries - 1:
                     time.sleep(1)
                 else:
@@ -106,24 +172,6 @@ class OllamaService:
         
         return None
     
-    def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
-        """Convert OpenAI-style messages to a single prompt."""
-        prompt_parts = []
-        
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            
-            if role == "system":
-                prompt_parts.append(f"System: {content}\n")
-            elif role == "user":
-                prompt_parts.append(f"User: {content}\n")
-            elif role == "assistant":
-                prompt_parts.append(f"Assistant: {content}\n")
-        
-        prompt_parts.append("Assistant: ")
-        return "\n".join(prompt_parts)
-    
     def categorize_email(self, email_content: str, categorization_prompt: str) -> Optional[str]:
         """
         Categorize email using LLM.
@@ -135,29 +183,128 @@ class OllamaService:
         Returns:
             Category name or None on failure
         """
-        # Replace placeholder safely
-        prompt = categorization_prompt.replace("{email_content}", email_content)
+        # Static instructions first and the email last, so Ollama reuses the cached prompt prefix
         messages = [
-            {"role": "system", "content": "You are an email classification expert. Respond with ONLY the category name."},
-            {"role": "user", "content": prompt}
+            {
+                "role": "system",
+                "content": CATEGORIZATION_SYSTEM_PREFIX + split_prompt_template(categorization_prompt)
+            },
+            {"role": "user", "content": email_content}
         ]
         
         response = self._call_llm(
             messages=messages,
             temperature=0.3,
+            cache=True,
+            validate=lambda text: self._parse_category(text) is not None,
             max_tokens=50
         )
         
-        if response:
-            # Extract category from response (handle extra text)
-            category = response.strip()
-            valid_categories = ["Important", "Newsletter", "Spam", "To-Do"]
-            for cat in valid_categories:
-                if cat.lower() in category.lower():
-                    return cat
-            return category
+        return self._parse_category(response)
+    
+    def categorize_emails_batch(
+        self,
+        email_contents: List[str],
+        categorization_prompt: str
+    ) -> Optional[List[Optional[str]]]:
+        """
+        Categorize several emails with a single LLM call.
         
-        return None
+        Args:
+            email_contents: Emails to categorize
+            categorization_prompt: Prompt template for categorization
+            
+        Returns:
+            Category per email in input order, or None if the response could
+            not be matched to the emails (callers should split and retry)
+        """
+        messages = [
+            {"role": "system", "content": build_batch_categorization_prompt(categorization_prompt)},
+            {"role": "user", "content": format_email_batch(email_contents)}
+        ]
+        
+        def all_categorized(text: str) -> bool:
+            categories = self._parse_category_batch(text, len(email_contents))
+            return categories is not None and None not in categories
+        
+        response = self._call_llm(
+            messages=messages,
+            temperature=0.3,
+            cache=True,
+            validate=all_categorized,
+            max_tokens=10 * len(email_contents) + 10
+        )
+        return self._parse_category_batch(response, len(email_contents))
+    
+    @staticmethod
+    def _parse_category(response: Optional[str]) -> Optional[str]:
+        """Normalize a categorization response to a category name."""
+        return parse_category(response)
+    
+    def _parse_category_batch(self, response: Optional[str], count: int) -> Optional[List[Optional[str]]]:
+        """Parse a batched categorization response, or None unless it holds one label per email."""
+        try:
+            labels = parse_embedded_json_array(response) if response else None
+        except ValueError as e:
+            logger.warning(f"Failed to parse batched categories: {e}")
+            return None
+        
+        if labels is None or len(labels) != count:
+            return None
+        return [self._parse_category(str(label)) if label else None for label in labels]
+    
+    def analyze_email(
+        self,
+        email_content: str,
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Categorize email and extract action items in a single LLM call.
+        
+        Args:
+            email_content: Email to analyze
+            categorization_prompt: Prompt template for categorization
+            action_prompt: Prompt template for action extraction
+            
+        Returns:
+            Dictionary with 'category' and 'action_items', or None on failure
+        """
+        messages = [
+            {"role": "system", "content": build_analysis_prompt(categorization_prompt, action_prompt)},
+            {"role": "user", "content": email_content}
+        ]
+        
+        response = self._call_llm(
+            messages=messages,
+            temperature=0.3,
+            cache=True,
+            validate=lambda text: self._parse_analysis(text) is not None,
+            max_tokens=550,
+            response_format=EMAIL_ANALYSIS_FORMAT if self.structured_outputs else "json"
+        )
+        return self._parse_analysis(response)
+    
+    def _parse_analysis(self, response: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Parse an analysis response, or None if it is malformed or names no valid category."""
+        if not response:
+            return None
+        
+        try:
+            analysis = EmailAnalysis.model_validate_json(response)
+        except ValidationError as e:
+            logger.error(f"Email analysis response failed validation: {e}")
+            return None
+        
+        category = self._parse_category(analysis.category)
+        if not category:
+            logger.warning(f"Email analysis returned an unknown category: {analysis.category!r}")
+            return None
+        
+        return {
+            "category": category,
+            "action_items": [item.model_dump() for item in analysis.action_items]
+        }
     
     def extract_action_items(
         self,
@@ -174,42 +321,53 @@ class OllamaService:
         Returns:
             List of action item dictionaries
         """
-        # Replace placeholder safely to avoid issues with JSON braces in prompt
-        prompt = action_prompt.replace("{email_content}", email_content)
         messages = [
-            {"role": "system", "content": "You are an expert at extracting actionable tasks from emails. Always respond with valid JSON."},
-            {"role": "user", "content": prompt}
+            {
+                "role": "system",
+                "content": ACTION_EXTRACTION_SYSTEM_PREFIX + split_prompt_template(action_prompt)
+            },
+            {"role": "user", "content": email_content}
         ]
         
         response = self._call_llm(
             messages=messages,
             temperature=0.5,
-            max_tokens=500
+            cache=True,
+            validate=lambda text: self._decode_action_items(text) is not None,
+            max_tokens=500,
+            response_format=ACTION_ITEMS_FORMAT if self.structured_outputs else None
         )
         
+        action_items = self._decode_action_items(response)
+        return action_items if action_items is not None else []
+    
+    def _decode_action_items(self, response: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Decode an action extraction response, or None if it holds no parseable action items."""
+        if response and self.structured_outputs:
+            # Schema-constrained decoding guarantees the shape; validation only guards truncation
+            try:
+                return [item.model_dump() for item in ActionItemList.model_validate_json(response).items]
+            except ValidationError as e:
+                logger.error(f"Structured action items failed validation: {e}")
+                return None
+        
         if response:
             try:
                 # Try to parse JSON response
                 response = response.strip()
                 
-                # Find JSON array in response
-                start_idx = response.find('[')
-                end_idx = response.rfind(']')
-                
-                if start_idx != -1 and end_idx != -1:
-                    json_str = response[start_idx:end_idx + 1]
-                    action_items = json.loads(json_str)
-                    return action_items if isinstance(action_items, list) else []
-                else:
+                # Find JSON array in response (keeps the complete items of a truncated array)
+                action_items = parse_embedded_json_array(response)
+                if action_items is None:
                     logger.warning("No JSON array found in action extraction response")
-                    return []
+                return action_items
                     
-            except json.JSONDecodeError as e:
+            except ValueError as e:
                 logger.error(f"Failed to parse action items JSON: {e}")
                 logger.error(f"Response was: {response}")
-                return []
+                return None
         
-        return []
+        return None
     
     def generate_reply(
         self,
@@ -230,15 +388,17 @@ class OllamaService:
         Returns:
             Draft reply text or None on failure
         """
-        # Replace placeholder safely
-        prompt = reply_prompt.replace("{email_content}", email_content)
-        
+        user_content = email_content
         if user_instruction:
-            prompt += f"\n\nAdditional Instructions: {user_instruction}"
+            user_content += f"\n\nAdditional Instructions: {user_instruction}"
         
         messages = [
-            {"role": "system", "content": "You are a professional email assistant. Write clear, concise, and appropriate email responses."},
-            {"role": "user", "content": prompt}
+            {
+                "role": "system",
+                "content": "You are a professional email assistant. Write clear, concise, and appropriate email responses.\n\n"
+                           + split_prompt_template(reply_prompt)
+            },
+            {"role": "user", "content": user_content}
         ]
         
         response = self._call_llm(
@@ -268,6 +428,83 @@ class OllamaService:
         Returns:
             Agent response or None on failure
         """
+        messages = self._build_query_messages(query, email_context, prompt_context, conversation_history)
+        
+        response = self._call_llm(
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1000
+        )
+        
+        return response
+    
+    def stream_response(
+        self,
+        query: str,
+        email_context: Optional[str] = None,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> Generator[str, None, None]:
+        """
+        Stream agent response for chat interface.
+        
+        Args:
+            query: User's question
+            email_context: Relevant email content
+            conversation_history: Previous messages
+            
+        Yields:
+            Response chunks as they arrive
+        """
+        messages = self._build_query_messages(query, email_context, None, conversation_history)
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "num_predict": 1000,
+                "temperature": 0.7
+            }
+        }
+        
+        streamed_chars = 0
+        try:
+            with self._client.stream(
+                "POST",
+                f"{self.base_url}/api/chat",
+                content=json_dumps_bytes(payload),
+                timeout=self.timeout
+            ) as response:
+                if response.status_code != 200:
+                    logger.warning("Ollama API returned status %s", response.status_code)
+                    return
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json_loads(line)
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        streamed_chars += len(token)
+                        yield token
+                    if chunk.get("done"):
+                        # The final chunk carries the token counts for the whole response
+                        self._record_usage(chunk, streamed_chars)
+                        break
+                        
+        except httpx.HTTPError as e:
+            logger.error(f"Streaming error: {e}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid streaming chunk from Ollama: {e}")
+    
+    def _build_query_messages(
+        self,
+        query: str,
+        email_context: Optional[str] = None,
+        prompt_context: Optional[str] = None,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> List[Dict[str, str]]:
+        """Build chat messages for an agent query."""
         messages = [
             {
                 "role": "system",
@@ -280,44 +517,101 @@ class OllamaService:
             }
         ]
         
-        # Add conversation history (last 5 messages)
+        # Add conversation history (last N messages within the token budget)
         if conversation_history:
-            messages.extend(conversation_history[-5:])
+            messages.extend(trim_history(
+                conversation_history, config.MAX_HISTORY_TOKENS, config.MAX_CONVERSATION_HISTORY
+            ))
         
         # Build context-aware query
         full_query = query
         if email_context:
+            email_context = truncate_to_tokens(email_context, config.MAX_CONTEXT_TOKENS)
             full_query = f"Email Context:\n{email_context}\n\nUser Query: {query}"
         
         if prompt_context:
             full_query += f"\n\nPrompt Configuration: {prompt_context}"
         
         messages.append({"role": "user", "content": full_query})
+        return messages
+    
+    def _record_usage(self, result: Dict[str, Any], content_chars: int):
+        """
+        Add a response's token counts to the session total.
         
-        response = self._call_llm(
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
+        Uses the exact prompt_eval_count/eval_count Ollama reports, falling
+        back to ~4 characters per token for servers that omit them.
         
-        return response
+        Args:
+            result: Final (or only) response object from /api/chat
+            content_chars: Length of the generated text
+        """
+        prompt_tokens = result.get("prompt_eval_count") or 0
+        completion_tokens = result.get("eval_count")
+        if completion_tokens is None:
+            completion_tokens = content_chars >> 2
+        self.total_tokens_used += prompt_tokens + completion_tokens
+        
+        # Prompt tokens actually evaluated; drops when Ollama reuses a cached prefix
+        logger.debug("Tokens used: %d prompt + %d completion", prompt_tokens, completion_tokens)
+    
+    def warmup(self, categorization_prompt: str, action_prompt: str):
+        """
+        Load the model and prefill the static system prompts of email processing.
+        
+        Each prompt is sent with a one-token generation budget so Ollama
+        computes and keeps its KV cache; the first real request then only
+        prefills the email. The fused analysis prompt (the default path) is
+        sent last so it is the one left in the cache.
+        
+        Args:
+            categorization_prompt: Prompt template for categorization
+            action_prompt: Prompt template for action extraction
+        """
+        system_prompts = [
+            CATEGORIZATION_SYSTEM_PREFIX + split_prompt_template(categorization_prompt),
+            ACTION_EXTRACTION_SYSTEM_PREFIX + split_prompt_template(action_prompt),
+            build_analysis_prompt(categorization_prompt, action_prompt)
+        ]
+        
+        for system_prompt in system_prompts:
+            payload = {
+                "model": self.model,
+                "messages": [{"role": "system", "content": system_prompt}],
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {
+                    "num_predict": 1
+                }
+            }
+            try:
+                self._client.post(
+                    f"{self.base_url}/api/chat",
+                    content=json_dumps_bytes(payload),
+                    timeout=self.timeout
+                )
+            except httpx.HTTPError as e:
+                logger.debug("Ollama warmup request failed: %s", e)
+                return
+        
+        logger.debug("Ollama warmed up with %d system prompts", len(system_prompts))
     
     def get_token_usage(self) -> int:
-        """Get estimated tokens used in this session."""
+        """Get tokens used in this session."""
         return int(self.total_tokens_used)
     
     def check_health(self) -> bool:
         """Check if Ollama is running and model is available."""
         try:
             # Check if Ollama is running
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self._client.get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
-                models = response.json().get("models", [])
+                models = json_loads(response.content).get("models", [])
                 model_names = [m.get("name", "") for m in models]
                 
                 # Check if our model is available
                 if any(self.model in name for name in model_names):
-                    logger.info(f"✓ Ollama is running with model: {self.model}")
+                    logger.debug("Ollama is running with model: %s", self.model)
                     return True
                 else:
                     logger.warning(f"Model '{self.model}' not found. Available: {model_names}")
@@ -0,0 +1,34 @@
+"""Cached loader for the default prompt templates file."""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any
+
+from backend.serialization import json_loads
+
+DEFAULT_PROMPTS_PATH = "prompts/default_prompts.json"
+
+
+@lru_cache(maxsize=4)
+def _parse_prompts(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a prompts file (mtime_ns only keys the cache)."""
+    return json_loads(Path(path).read_bytes())
+
+
+def load_prompts(path: str = DEFAULT_PROMPTS_PATH) -> Dict[str, Any]:
+    """
+    Load prompt templates, re-reading the file only when it has changed.
+    
+    The result is shared between callers and must not be mutated.
+    
+    Args:
+        path: Path to the JSON prompts file
+    
+    Returns:
+        Mapping of prompt type to its definition
+    
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not valid JSON
+    """
+    return _parse_prompts(path, os.stat(path).st_mtime_ns)
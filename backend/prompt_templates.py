@@ -0,0 +1,141 @@
+"""Helpers for turning stored prompt templates into LLM messages and parsing replies."""
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+EMAIL_IN_USER_MESSAGE = "(The email is provided in the user message.)"
+
+VALID_CATEGORIES = ["Important", "Newsletter", "Spam", "To-Do"]
+_CATEGORY_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, VALID_CATEGORIES)) + r")\b", re.IGNORECASE)
+_CATEGORY_BY_LOWER = {category.lower(): category for category in VALID_CATEGORIES}
+# Labels reduced to letters, for matching "Newsletters", "todo" or run-together labels
+_CATEGORY_BY_LETTERS = {re.sub(r"[^a-z]", "", category.lower()): category for category in VALID_CATEGORIES}
+
+
+@lru_cache(maxsize=64)
+def _compile_template(template: str) -> Tuple[str, ...]:
+    """Split a template at its {email_content} placeholders, unescaping {{ and }} once."""
+    parts = template.split("{email_content}")
+    try:
+        return tuple(part.format() for part in parts)
+    except (KeyError, IndexError, ValueError):
+        # User-edited templates may contain stray braces; keep them literally
+        return tuple(parts)
+
+
+def render_prompt_template(template: str, email_content: str) -> str:
+    """
+    Fill the {email_content} placeholder of a prompt template.
+    
+    The template is parsed once and cached, and braces inside the email are
+    never interpreted (str.format on the filled template would fail on them).
+    
+    Args:
+        template: Prompt template containing {email_content}
+        email_content: Text to insert
+        
+    Returns:
+        Rendered prompt
+    """
+    return email_content.join(_compile_template(template))
+
+
+@lru_cache(maxsize=64)
+def split_prompt_template(template: str) -> str:
+    """
+    Turn a prompt template into static instructions for the system message.
+    
+    The {email_content} placeholder is replaced by a pointer to the user
+    message, so the system message is identical across emails and providers
+    can serve it from their prompt cache (OpenAI applies automatic caching
+    once the static prefix reaches 1024 tokens).
+    
+    Args:
+        template: Prompt template containing {email_content}
+        
+    Returns:
+        Static instruction text
+    """
+    return render_prompt_template(template, EMAIL_IN_USER_MESSAGE)
+
+
+@lru_cache(maxsize=16)
+def build_analysis_prompt(categorization_prompt: str, action_prompt: str) -> str:
+    """
+    Fuse the categorization and action extraction templates into one system prompt.
+    
+    Lets a single LLM call return both results as one JSON object while the
+    two templates stay individually editable.
+    
+    Args:
+        categorization_prompt: Prompt template for categorization
+        action_prompt: Prompt template for action extraction
+        
+    Returns:
+        Static instruction text for combined analysis
+    """
+    return (
+        "You are an email analysis expert. Perform both tasks below on the email.\n\n"
+        "## Task 1: Categorization\n"
+        f"{split_prompt_template(categorization_prompt)}\n\n"
+        "## Task 2: Action Items\n"
+        f"{split_prompt_template(action_prompt)}\n\n"
+        "## Output\n"
+        "Ignore the per-task output instructions above and respond with ONLY a JSON object: "
+        '{"category": "<category name>", "action_items": [{"task": "...", "deadline": "... or null", '
+        '"priority": "high|medium|low"}]}'
+    )
+
+
+@lru_cache(maxsize=16)
+def build_batch_categorization_prompt(categorization_prompt: str) -> str:
+    """
+    Turn the categorization template into a system prompt for several emails at once.
+    
+    Args:
+        categorization_prompt: Prompt template for categorization
+        
+    Returns:
+        Static instruction text for batched categorization
+    """
+    return (
+        "You are an email classification expert.\n\n"
+        f"{split_prompt_template(categorization_prompt)}\n\n"
+        "The user message contains several emails, each introduced by its index in "
+        "brackets, e.g. [0]. Ignore the output instructions above and respond with ONLY "
+        'a JSON array of category names, one per email in order, e.g. ["Important", "Spam"]'
+    )
+
+
+def format_email_batch(email_contents: List[str]) -> str:
+    """Number emails for a batched prompt (see build_batch_categorization_prompt)."""
+    return "\n\n".join(f"[{index}]\n{content}" for index, content in enumerate(email_contents))
+
+
+def parse_category(response: Optional[str]) -> Optional[str]:
+    """
+    Normalize a categorization response to a category name.
+    
+    Models often wrap the label in extra text ("Category: spam."), so the
+    first valid category mentioned as a word wins. Failing that, labels are
+    looked for case-insensitively inside words ("Newsletters", "ToDo",
+    "ImportantNewsletter"), earliest first. Responses naming no valid
+    category yield None so free text never ends up stored as a category.
+    
+    Args:
+        response: Raw LLM response
+        
+    Returns:
+        Canonical category name, or None if no valid category was found
+    """
+    if not response:
+        return None
+    
+    match = _CATEGORY_PATTERN.search(response)
+    if match:
+        return _CATEGORY_BY_LOWER[match.group(1).lower()]
+    
+    letters = re.sub(r"[^a-z]", "", response.lower())
+    positions = [(letters.find(label), category) for label, category in _CATEGORY_BY_LETTERS.items()]
+    found = [position for position in positions if position[0] >= 0]
+    return min(found)[1] if found else None
@@ -0,0 +1,156 @@
+"""Deterministic email categorization rules applied before any model."""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from email.utils import parseaddr
+from typing import Dict, Optional, Set
+
+from backend.config import config
+from backend.database import db, Database
+from backend.models import Email
+
+# Set up logging (handlers are configured by the application entry point)
+logger = logging.getLogger(__name__)
+
+_REPLY_SUBJECT_PATTERN = re.compile(r"^\s*(?:re|fwd?)\s*:", re.IGNORECASE)
+_NEWSLETTER_MAILBOX_PATTERN = re.compile(r"^(?:newsletters?|digest|weekly)$", re.IGNORECASE)
+_UNSUBSCRIBE_PATTERN = re.compile(r"\bunsubscribe\b", re.IGNORECASE)
+_SPAM_PHRASE_PATTERN = re.compile(
+    r"\b(?:you(?:'ve| have) won|lottery winner|claim your (?:prize|reward|winnings)|crypto giveaway)\b",
+    re.IGNORECASE
+)
+
+# Characters of the body scanned by content rules (bounds the cost on long emails)
+CONTENT_SCAN_CHARS = 2000
+
+# Seconds before the frequent-contacts set is recomputed from the inbox
+CONTACTS_REFRESH_SECONDS = 300
+
+
+def _load_entries(path: str) -> Set[str]:
+    """Read a one-entry-per-line list file, ignoring blank lines and # comments."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {
+                line.strip().lower() for line in f
+                if line.strip() and not line.lstrip().startswith("#")
+            }
+    except FileNotFoundError:
+        return set()
+    except Exception as e:
+        logger.error(f"Failed to load rule list {path}: {e}")
+        return set()
+
+
+class RuleClassifier:
+    """
+    Categorizes emails that need no judgement at all.
+    
+    Rules, in order:
+        - sender address or domain on the user's blocklist -> "Spam"
+        - a well-known scam phrase in the subject or opening of the body -> "Spam"
+        - sender domain of a bulk newsletter provider, a newsletter mailbox
+          such as newsletter@ / digest@, or an unsubscribe footer -> "Newsletter"
+        - a reply or forward ("Re:"/"Fwd:") from a frequent contact -> "Important"
+    
+    Everything else returns None and goes on to the local classifier or LLM.
+    """
+    
+    def __init__(
+        self,
+        database: Database = None,
+        newsletter_domains_path: str = None,
+        blocked_senders_path: str = None,
+        frequent_contact_min_emails: int = None
+    ):
+        """
+        Initialize classifier.
+        
+        Args:
+            database: Database used to find frequent contacts
+            newsletter_domains_path: File listing newsletter provider domains
+            blocked_senders_path: File listing blocked addresses or domains
+            frequent_contact_min_emails: Emails from a sender that make it a frequent contact
+        """
+        self.db = database or db
+        self.newsletter_domains = _load_entries(newsletter_domains_path or config.NEWSLETTER_DOMAINS_PATH)
+        self.blocked_senders = _load_entries(blocked_senders_path or config.BLOCKED_SENDERS_PATH)
+        self.frequent_contact_min_emails = (
+            frequent_contact_min_emails if frequent_contact_min_emails is not None
+            else config.FREQUENT_CONTACT_MIN_EMAILS
+        )
+        self._lock = threading.Lock()
+        self._contacts: Set[str] = set()
+        self._contacts_loaded_at: Optional[float] = None
+        self._hits: Counter = Counter()
+    
+    def classify(self, email: Email) -> Optional[str]:
+        """
+        Categorize an email by rule.
+        
+        Args:
+            email: Email object to categorize
+        
+        Returns:
+            Category name, or None when no rule applies
+        """
+        category = self._match(email)
+        with self._lock:
+            self._hits[category or "none"] += 1
+        return category
+    
+    def stats(self) -> Dict[str, int]:
+        """Emails seen per rule outcome ("none" counts those left to the models)."""
+        with self._lock:
+            return dict(self._hits)
+    
+    def _match(self, email: Email) -> Optional[str]:
+        """Apply the rules in order, returning the first category that matches."""
+        address = parseaddr(email.sender)[1].lower()
+        mailbox, _, domain = address.rpartition("@")
+        
+        if address in self.blocked_senders or self._domain_listed(domain, self.blocked_senders):
+            return "Spam"
+        
+        if _SPAM_PHRASE_PATTERN.search(email.subject) or _SPAM_PHRASE_PATTERN.search(email.body, 0, CONTENT_SCAN_CHARS):
+            return "Spam"
+        
+        if (
+            self._domain_listed(domain, self.newsletter_domains)
+            or _NEWSLETTER_MAILBOX_PATTERN.match(mailbox)
+            # Unsubscribe links live in the footer, so scan the end of the body
+            or _UNSUBSCRIBE_PATTERN.search(email.body, max(0, len(email.body) - CONTENT_SCAN_CHARS))
+        ):
+            return "Newsletter"
+        
+        if _REPLY_SUBJECT_PATTERN.match(email.subject) and address in self._frequent_contacts():
+            return "Important"
+        
+        return None
+    
+    @staticmethod
+    def _domain_listed(domain: str, listed: Set[str]) -> bool:
+        """Check a domain and each of its parent domains against a set."""
+        parts = domain.split(".")
+        return any(".".join(parts[i:]) in listed for i in range(len(parts) - 1))
+    
+    def _frequent_contacts(self) -> Set[str]:
+        """Addresses of frequent senders, recomputed every CONTACTS_REFRESH_SECONDS."""
+        with self._lock:
+            now = time.monotonic()
+            if self._contacts_loaded_at is None or now - self._contacts_loaded_at > CONTACTS_REFRESH_SECONDS:
+                self._contacts_loaded_at = now
+                try:
+                    self._contacts = {
+                        parseaddr(sender)[1].lower()
+                        for sender in self.db.get_frequent_senders(self.frequent_contact_min_emails)
+                    }
+                except Exception as e:
+                    logger.error(f"Failed to load frequent contacts: {e}")
+            return self._contacts
+
+
+# Singleton rule classifier instance
+rule_classifier = RuleClassifier()
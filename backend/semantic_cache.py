@@ -0,0 +1,318 @@
+"""Semantic response cache for agent queries."""
+import bisect
+import hashlib
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - numba is optional
+    njit = None
+
+from backend.config import config
+from backend.database import db, Database
+from backend.fast_features import quantize_rows
+from backend.serialization import parse_datetime
+
+# Set up logging (handlers are configured by the application entry point)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 384
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+# Queries from which _batch_scores switches to a float32 matrix product
+MIN_MATMUL_QUERIES = 8
+
+
+def quantize(vector: np.ndarray) -> tuple:
+    """
+    Quantize a vector to int8 with a symmetric per-vector scale.
+    
+    Returns:
+        Tuple of (int8 vector, scale) where vector ~= int8 vector * scale
+    """
+    max_abs = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = max_abs / 127.0 if max_abs > 0 else 1.0
+    return np.round(vector / scale).astype(np.int8), np.float32(scale)
+
+
+def _masked_scores_numpy(
+    embeddings: np.ndarray,
+    scales: np.ndarray,
+    email_ids: np.ndarray,
+    query: np.ndarray,
+    query_scale: float,
+    email_key: int
+) -> np.ndarray:
+    """Cosine scores of int8 rows against an int8 query, -1 for rows about other emails."""
+    scores = (embeddings.astype(np.float32) @ query.astype(np.float32)) * (scales * query_scale)
+    scores[email_ids != email_key] = -1.0
+    return scores
+
+
+if njit is not None:
+    # Serial and nogil rather than parallel=True: numba's default workqueue threading
+    # layer is not safe to enter from several threads (Streamlit runs scripts on
+    # worker threads) and left the interpreter hanging at shutdown.
+    @njit(nogil=True, fastmath=True, cache=True)
+    def _masked_scores(embeddings, scales, email_ids, query, query_scale, email_key):
+        """Numba kernel equivalent to _masked_scores_numpy."""
+        n, dim = embeddings.shape
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            if email_ids[i] != email_key:
+                scores[i] = -1.0
+                continue
+            acc = np.int32(0)
+            for j in range(dim):
+                acc += np.int32(embeddings[i, j]) * np.int32(query[j])
+            scores[i] = acc * scales[i] * query_scale
+        return scores
+    
+    # Compile once at import so the first lookup doesn't pay JIT latency
+    _masked_scores(
+        np.zeros((1, EMBEDDING_DIM), dtype=np.int8),
+        np.ones(1, dtype=np.float32),
+        np.zeros(1, dtype=np.int64),
+        np.zeros(EMBEDDING_DIM, dtype=np.int8),
+        np.float32(1.0),
+        0
+    )
+else:
+    _masked_scores = _masked_scores_numpy
+
+
+def _batch_scores(
+    embeddings: np.ndarray,
+    scales: np.ndarray,
+    queries: np.ndarray,
+    query_scales: np.ndarray,
+    chunk_rows: int = 4096
+) -> np.ndarray:
+    """
+    Cosine scores of int8 rows against several int8 queries, one row of scores per query.
+    
+    For several queries one float32 matrix product (BLAS) beats running the
+    int8 kernel per query; rows are widened chunk by chunk so the float32
+    copy stays small. A few queries don't repay the widening and use the
+    int8 kernel directly.
+    """
+    if len(queries) < MIN_MATMUL_QUERIES:
+        keys = np.zeros(len(embeddings), dtype=np.int64)
+        scores = np.empty((len(queries), len(embeddings)), dtype=np.float32)
+        for row, (query, query_scale) in enumerate(zip(queries, query_scales)):
+            scores[row] = _masked_scores(embeddings, scales, keys, query, query_scale, 0)
+        return scores
+    
+    weighted_queries = queries.astype(np.float32) * query_scales[:, None]
+    scores = np.empty((len(queries), len(embeddings)), dtype=np.float32)
+    for start in range(0, len(embeddings), chunk_rows):
+        end = start + chunk_rows
+        scores[:, start:end] = weighted_queries @ embeddings[start:end].astype(np.float32).T
+    scores *= scales[None, :]
+    return scores
+
+
+def embed_text(text: str) -> np.ndarray:
+    """
+    Embed text as an L2-normalized hashed bag of words and word bigrams.
+    
+    Uses a stable hash so vectors stay comparable across processes once
+    they are persisted.
+    
+    Args:
+        text: Text to embed
+    
+    Returns:
+        float32 vector of shape (EMBEDDING_DIM,)
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[digest % EMBEDDING_DIM] += 1.0 if digest >> 63 else -1.0
+    
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class SemanticCache:
+    """
+    Cache of LLM responses looked up by cosine similarity of the query.
+    
+    Embeddings are persisted as float32 and held in memory as int8 with a
+    per-row scale, quartering the size of the matrix scanned per lookup.
+    The in-memory arrays grow by doubling their capacity, so storing an
+    entry doesn't copy the whole index; the first _size rows are live.
+    """
+    
+    def __init__(
+        self,
+        database: Database = None,
+        threshold: float = None,
+        ttl_seconds: int = None
+    ):
+        """
+        Initialize cache.
+        
+        Args:
+            database: Database used to persist entries
+            threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Entry lifetime before eviction
+        """
+        self.db = database or db
+        self.threshold = threshold if threshold is not None else config.SEMANTIC_CACHE_THRESHOLD
+        self.ttl = timedelta(seconds=ttl_seconds if ttl_seconds is not None else config.SEMANTIC_CACHE_TTL_SECONDS)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._size = 0
+        self._embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._email_ids = np.empty(0, dtype=np.int64)
+        self._responses: List[str] = []
+        self._created_at: List[datetime] = []
+    
+    def lookup(self, query: str, email_id: Optional[int] = None) -> Optional[str]:
+        """
+        Find a cached response for a similar query about the same email.
+        
+        Args:
+            query: User query
+            email_id: Email the query is about (None for inbox-wide)
+        
+        Returns:
+            Cached response or None on miss
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self._evict_expired()
+            
+            if not self._responses:
+                return None
+            
+            query_vector, query_scale = quantize(embed_text(query))
+            size = self._size
+            scores = _masked_scores(
+                self._embeddings[:size], self._scales[:size], self._email_ids[:size],
+                query_vector, query_scale, self._email_key(email_id)
+            )
+            best = int(np.argmax(scores))
+            
+            if scores[best] >= self.threshold:
+                logger.debug("Semantic cache hit (similarity %.3f)", scores[best])
+                return self._responses[best]
+        
+        return None
+    
+    def store(self, query: str, email_id: Optional[int], response: str):
+        """
+        Add a response to the cache.
+        
+        Args:
+            query: User query
+            email_id: Email the query is about (None for inbox-wide)
+            response: LLM response to cache
+        """
+        embedding = embed_text(query)
+        created_at = datetime.utcnow()
+        
+        with self._lock:
+            self._ensure_loaded()
+            try:
+                self.db.insert_cached_response(embedding.tobytes(), query, email_id, response, created_at)
+            except Exception as e:
+                logger.error(f"Failed to persist cached response: {e}")
+            
+            self._append(embedding, email_id, response, created_at)
+    
+    def clear(self):
+        """Drop all in-memory entries (persisted rows expire via TTL)."""
+        with self._lock:
+            self._size = 0
+            self._embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+            self._scales = np.empty(0, dtype=np.float32)
+            self._email_ids = np.empty(0, dtype=np.int64)
+            self._responses = []
+            self._created_at = []
+    
+    def _ensure_loaded(self):
+        """Load unexpired entries from the database on first use."""
+        if self._loaded:
+            return
+        self._loaded = True
+        
+        cutoff = datetime.utcnow() - self.ttl
+        try:
+            self.db.delete_cached_responses(cutoff)
+            rows = self.db.get_cached_responses(cutoff)
+        except Exception as e:
+            logger.error(f"Failed to load response cache: {e}")
+            return
+        
+        if not rows:
+            return
+        
+        # Quantize all persisted entries in one pass instead of appending row by row
+        embeddings = np.frombuffer(b"".join(row['embedding'] for row in rows), dtype=np.float32)
+        self._embeddings, self._scales = quantize_rows(embeddings.reshape(len(rows), EMBEDDING_DIM))
+        self._email_ids = np.array([self._email_key(row['email_id']) for row in rows], dtype=np.int64)
+        self._responses = [row['response'] for row in rows]
+        self._created_at = [parse_datetime(row['created_at']) for row in rows]
+        self._size = len(rows)
+    
+    def _evict_expired(self):
+        """Drop entries older than the TTL (entries are kept in insertion order)."""
+        cutoff = datetime.utcnow() - self.ttl
+        expired = bisect.bisect_left(self._created_at, cutoff)
+        if not expired:
+            return
+        
+        # Shift the live rows to the front, keeping the capacity
+        size = self._size
+        self._embeddings[:size - expired] = self._embeddings[expired:size]
+        self._scales[:size - expired] = self._scales[expired:size]
+        self._email_ids[:size - expired] = self._email_ids[expired:size]
+        self._size = size - expired
+        self._responses = self._responses[expired:]
+        self._created_at = self._created_at[expired:]
+        
+        try:
+            self.db.delete_cached_responses(cutoff)
+        except Exception as e:
+            logger.error(f"Failed to evict expired cache entries: {e}")
+    
+    def _append(self, embedding: np.ndarray, email_id: Optional[int], response: str, created_at: datetime):
+        """Append one entry to the in-memory index, stored as int8."""
+        if self._size == len(self._scales):
+            capacity = max(16, 2 * self._size)
+            self._embeddings = self._resized(self._embeddings, capacity)
+            self._scales = self._resized(self._scales, capacity)
+            self._email_ids = self._resized(self._email_ids, capacity)
+        
+        quantized, scale = quantize(embedding)
+        self._embeddings[self._size] = quantized
+        self._scales[self._size] = scale
+        self._email_ids[self._size] = self._email_key(email_id)
+        self._size += 1
+        self._responses.append(response)
+        self._created_at.append(created_at)
+    
+    @staticmethod
+    def _resized(array: np.ndarray, capacity: int) -> np.ndarray:
+        """Copy of an array with room for capacity rows (the extra rows are uninitialized)."""
+        resized = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        resized[:len(array)] = array
+        return resized
+    
+    @staticmethod
+    def _email_key(email_id: Optional[int]) -> int:
+        """Map optional email ID to an integer key (-1 for inbox-wide)."""
+        return -1 if email_id is None else email_id
@@ -0,0 +1,106 @@
+"""JSON and timestamp (de)serialization helpers backed by C parsers when available."""
+import io
+import json
+from datetime import datetime
+from typing import Any, BinaryIO, Iterator, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - ijson is optional
+    ijson = None
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso8601
+except ImportError:  # pragma: no cover - ciso8601 is optional
+    def _parse_iso8601(value: str) -> datetime:
+        # fromisoformat only accepts a trailing 'Z' from Python 3.11
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """Decode JSON text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Encode an object as compact JSON text (unknown types are stringified)."""
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=str, option=option).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=str)
+
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    """Encode an object as compact UTF-8 JSON bytes, e.g. for an HTTP request body."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def iter_json_array(f: BinaryIO) -> Iterator[Any]:
+    """
+    Yield the items of a top-level JSON array from a binary file.
+    
+    Streams with ijson when available so memory stays flat regardless of
+    file size; otherwise the whole document is parsed at once.
+    """
+    if ijson is not None:
+        return ijson.items(f, "item", use_float=True)
+    return iter(json_loads(f.read()))
+
+
+def parse_embedded_json_array(text: str) -> Optional[List[Any]]:
+    """
+    Parse the first JSON array in free-form LLM output.
+    
+    Commentary before the array is skipped. A well-formed array is decoded
+    in one call; a truncated or malformed one (e.g. cut off by max_tokens)
+    is streamed with ijson so the items before the error are kept.
+    
+    Args:
+        text: Model response that should contain a JSON array
+        
+    Returns:
+        List of decoded items, or None when the text contains no array
+        
+    Raises:
+        ValueError: If the array is malformed and ijson is not installed
+    """
+    start = text.find("[")
+    if start == -1:
+        return None
+    
+    end = text.rfind("]")
+    if end > start:
+        try:
+            value = json_loads(text[start:end + 1])
+            if isinstance(value, list):
+                return value
+        except ValueError:
+            if ijson is None:
+                raise
+    
+    if ijson is None:
+        raise ValueError("Unterminated JSON array")
+    
+    items = []
+    try:
+        for item in ijson.items(io.BytesIO(text[start:].encode("utf-8")), "item", use_float=True):
+            items.append(item)
+    except ijson.JSONError:
+        pass
+    return items
+
+
+def parse_datetime(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp (database values or 'Z'-suffixed inbox data)."""
+    return _parse_iso8601(value)
@@ -0,0 +1,150 @@
+"""Token-budgeted trimming of prompt context and conversation history."""
+import hashlib
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is optional
+    tiktoken = None
+
+from backend.config import config
+
+# Set up logging (handlers are configured by the application entry point)
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "\n...[truncated]"
+
+# Rough characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Where tiktoken downloads the cl100k_base vocabulary from (and derives its cache file name)
+CL100K_BASE_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+
+
+def _vocabulary_cached() -> bool:
+    """Whether tiktoken can load cl100k_base from its local cache, mirroring tiktoken.load."""
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        cache_dir = os.environ["TIKTOKEN_CACHE_DIR"]
+    elif "DATA_GYM_CACHE_DIR" in os.environ:
+        cache_dir = os.environ["DATA_GYM_CACHE_DIR"]
+    else:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return False
+    return os.path.exists(os.path.join(cache_dir, hashlib.sha1(CL100K_BASE_URL.encode()).hexdigest()))
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """
+    Load the tokenizer once, or None to estimate tokens from length.
+    
+    The vocabulary is only used when it is already cached locally: fetching
+    it is a network download that stalls offline installs on their first
+    prompt. Ollama models don't use cl100k_base anyway, so they always get
+    the estimate.
+    """
+    if tiktoken is None or config.LLM_PROVIDER == "ollama" or not _vocabulary_cached():
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except (OSError, ValueError) as e:
+        # OSError covers network and file errors, ValueError a corrupt vocabulary
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or estimate) the tokens in a piece of text.
+    
+    cl100k_base is exact for OpenAI models; without it (and for local models)
+    the count is estimated at CHARS_PER_TOKEN characters per token.
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        Token count
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text down to a token budget, marking where it was cut.
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum tokens to keep
+    
+    Returns:
+        The original text if it fits, otherwise its first max_tokens tokens
+        followed by TRUNCATION_MARKER
+    """
+    encoding = _encoding()
+    if encoding is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars] + TRUNCATION_MARKER
+    
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+
+
+def trim_history(
+    history: List[Dict[str, str]],
+    max_tokens: int,
+    max_messages: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """
+    Keep the most recent messages that fit in a token budget.
+    
+    Leading system messages (the summary of older turns) are pinned: they
+    are always kept and charged against the budget first, and only the
+    turns after them are trimmed, oldest first. A pinned message that alone
+    exceeds the budget is truncated to it.
+    
+    Args:
+        history: Chat messages, oldest first
+        max_tokens: Token budget for the kept messages' content
+        max_messages: Optional cap on the number of messages kept, pinned ones included
+    
+    Returns:
+        Pinned messages followed by the most recent turns within both limits, oldest first
+    """
+    pinned_count = 0
+    while pinned_count < len(history) and history[pinned_count].get("role") == "system":
+        pinned_count += 1
+    
+    pinned = []
+    remaining = max_tokens
+    for message in history[:pinned_count]:
+        tokens = count_tokens(message["content"])
+        if tokens > remaining:
+            message = {**message, "content": truncate_to_tokens(message["content"], max(remaining, 0))}
+            tokens = remaining
+        remaining -= tokens
+        pinned.append(message)
+    
+    turns = history[pinned_count:]
+    if max_messages:
+        turn_limit = max_messages - len(pinned)
+        turns = turns[-turn_limit:] if turn_limit > 0 else []
+    
+    kept = []
+    for message in reversed(turns):
+        remaining -= count_tokens(message["content"])
+        if remaining < 0:
+            break
+        kept.append(message)
+    kept.reverse()
+    return pinned + kept
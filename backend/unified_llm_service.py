@@ -1,11 +1,14 @@
 """Unified LLM service that works with both OpenAI and Ollama."""
+import asyncio
+import atexit
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterator
 
 from backend.config import config
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
 
@@ -17,19 +20,22 @@ class UnifiedLLMService:
         self.provider = config.LLM_PROVIDER
         self.service = None
         
-        logger.info(f"Initializing LLM service with provider: {self.provider}")
+        logger.debug("Initializing LLM service with provider: %s", self.provider)
         
         if self.provider == "ollama":
             from backend.ollama_service import OllamaService
             self.service = OllamaService(
                 base_url=config.OLLAMA_BASE_URL,
-                model=config.OLLAMA_MODEL
+                model=config.OLLAMA_MODEL,
+                keep_alive=config.OLLAMA_KEEP_ALIVE
             )
             logger.info(f"✓ Using Ollama (FREE) with model: {config.OLLAMA_MODEL}")
             
             # Check health
             if self.service.check_health():
                 logger.info("✓ Ollama is ready!")
+                # Prefill the processing prompts off the startup path
+                threading.Thread(target=self._warmup, name="ollama-warmup", daemon=True).start()
             else:
                 logger.warning("⚠️ Ollama model not found. Run: ollama pull llama3.2")
                 
@@ -39,15 +45,146 @@ class UnifiedLLMService:
             logger.info(f"✓ Using OpenAI with model: {config.OPENAI_MODEL}")
         else:
             raise ValueError(f"Unknown LLM provider: {self.provider}")
+        
+        atexit.register(self.close)
+    
+    def _warmup(self):
+        """Prefill the provider's cache with the stored processing prompts."""
+        from backend.database import db
+        
+        try:
+            categorization_prompt = db.get_prompt("categorization")
+            action_prompt = db.get_prompt("action_extraction")
+        except Exception as e:
+            logger.debug("Skipping LLM warmup, prompts unavailable: %s", e)
+            return
+        
+        if categorization_prompt and action_prompt:
+            self.service.warmup(categorization_prompt.prompt_text, action_prompt.prompt_text)
+    
+    def close(self):
+        """Release the provider's pooled HTTP connections."""
+        try:
+            self.service.close()
+        except Exception as e:
+            logger.warning(f"Error closing LLM service: {e}")
     
     def categorize_email(self, email_content: str, categorization_prompt: str) -> Optional[str]:
         """Categorize email using configured LLM."""
         return self.service.categorize_email(email_content, categorization_prompt)
     
+    def categorize_emails_batch(
+        self,
+        email_contents: List[str],
+        categorization_prompt: str,
+        batch_size: int = 10,
+        max_chars: int = None
+    ) -> List[Optional[str]]:
+        """
+        Categorize many emails, packing several into each LLM call.
+        
+        Emails are grouped up to batch_size per call and max_chars of email
+        text per prompt, and up to BATCH_CONCURRENCY groups are in flight at
+        once. A group whose response can't be matched back to its emails is
+        split in half and retried, down to single-email calls.
+        
+        Args:
+            email_contents: Emails to categorize
+            categorization_prompt: Prompt template for categorization
+            batch_size: Maximum emails per LLM call
+            max_chars: Maximum email characters per LLM call
+            
+        Returns:
+            Category per email in input order (None on failure)
+        """
+        max_chars = max_chars or config.BATCH_CATEGORIZATION_MAX_CHARS
+        
+        groups: List[List[str]] = []
+        group_chars = 0
+        for content in email_contents:
+            if groups and len(groups[-1]) < batch_size and group_chars + len(content) <= max_chars:
+                groups[-1].append(content)
+                group_chars += len(content)
+            else:
+                groups.append([content])
+                group_chars = len(content)
+        
+        categories: List[Optional[str]] = []
+        for group_categories in self._run_batch(
+            lambda group: self._categorize_group(group, categorization_prompt), groups
+        ):
+            categories.extend(group_categories)
+        return categories
+    
+    def _categorize_group(self, email_contents: List[str], categorization_prompt: str) -> List[Optional[str]]:
+        """Categorize one group in a single call, halving it on unusable responses."""
+        if len(email_contents) == 1:
+            return [self.service.categorize_email(email_contents[0], categorization_prompt)]
+        
+        categories = self.service.categorize_emails_batch(email_contents, categorization_prompt)
+        if categories is not None:
+            return categories
+        
+        logger.debug("Batched categorization of %d emails failed; splitting", len(email_contents))
+        middle = len(email_contents) // 2
+        return (
+            self._categorize_group(email_contents[:middle], categorization_prompt)
+            + self._categorize_group(email_contents[middle:], categorization_prompt)
+        )
+    
     def extract_action_items(self, email_content: str, action_prompt: str) -> List[Dict[str, Any]]:
         """Extract action items using configured LLM."""
         return self.service.extract_action_items(email_content, action_prompt)
     
+    def analyze_email(
+        self,
+        email_content: str,
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """Categorize and extract action items in one call using configured LLM."""
+        return self.service.analyze_email(email_content, categorization_prompt, action_prompt)
+    
+    async def acategorize_email(self, email_content: str, categorization_prompt: str) -> Optional[str]:
+        """Categorize email without blocking the event loop (see aanswer_query)."""
+        return await asyncio.to_thread(self.service.categorize_email, email_content, categorization_prompt)
+    
+    async def aextract_action_items(self, email_content: str, action_prompt: str) -> List[Dict[str, Any]]:
+        """Extract action items without blocking the event loop (see aanswer_query)."""
+        return await asyncio.to_thread(self.service.extract_action_items, email_content, action_prompt)
+    
+    async def aanalyze_email(
+        self,
+        email_content: str,
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """Categorize and extract action items without blocking the event loop (see aanswer_query)."""
+        return await asyncio.to_thread(
+            self.service.analyze_email, email_content, categorization_prompt, action_prompt
+        )
+    
+    def submit_analysis_batch(
+        self,
+        emails: Dict[int, str],
+        categorization_prompt: str,
+        action_prompt: str
+    ) -> Optional[str]:
+        """Submit offline categorization + extraction (OpenAI Batch API only)."""
+        if not self.supports_batch_api:
+            logger.warning("Batch API is only available with the OpenAI provider")
+            return None
+        return self.service.submit_analysis_batch(emails, categorization_prompt, action_prompt)
+    
+    def get_analysis_batch_results(self, batch_id: str) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Fetch results of an analysis batch (None while still running)."""
+        return self.service.get_analysis_batch_results(batch_id)
+    
+    @property
+    def supports_batch_api(self) -> bool:
+        """Whether the configured provider offers an offline batch endpoint."""
+        return self.provider == "openai"
+    
     def generate_reply(
         self,
         email_content: str,
@@ -68,9 +205,85 @@ class UnifiedLLMService:
         """Answer query using configured LLM."""
         return self.service.answer_query(query, email_context, prompt_context, conversation_history)
     
+    async def aanswer_query(
+        self,
+        query: str,
+        email_context: Optional[str] = None,
+        prompt_context: Optional[str] = None,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """
+        Answer query without blocking the event loop.
+        
+        Both provider clients are synchronous, so the call runs in a worker
+        thread; independent calls can then overlap via asyncio.gather.
+        """
+        return await asyncio.to_thread(
+            self.service.answer_query, query, email_context, prompt_context, conversation_history
+        )
+    
+    def answer_query_stream(
+        self,
+        query: str,
+        email_context: Optional[str] = None,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> Iterator[str]:
+        """Stream answer tokens from the configured LLM as they are generated."""
+        return self.service.stream_response(query, email_context, conversation_history)
+    
+    def answer_queries_batch(
+        self,
+        queries: List[str],
+        email_contexts: List[Optional[str]]
+    ) -> List[Optional[str]]:
+        """
+        Answer several independent queries concurrently.
+        
+        Requests are submitted together so the backend can batch decoding
+        instead of sitting idle between serial round-trips.
+        
+        Args:
+            queries: User questions, one per request
+            email_contexts: Email context for each query (same length as queries)
+            
+        Returns:
+            Responses in the same order as the queries (None on failure)
+        """
+        return self._run_batch(
+            lambda args: self.service.answer_query(args[0], args[1]),
+            list(zip(queries, email_contexts))
+        )
+    
+    def generate_replies_batch(
+        self,
+        email_contents: List[str],
+        contexts: List[str],
+        reply_prompt: str,
+        user_instruction: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """Generate replies for several emails concurrently, preserving order."""
+        return self._run_batch(
+            lambda args: self.service.generate_reply(args[0], args[1], reply_prompt, user_instruction),
+            list(zip(email_contents, contexts))
+        )
+    
+    def _run_batch(self, func, items: List[Any]) -> List[Any]:
+        """Run func over items with bounded concurrency, preserving order."""
+        if not items:
+            return []
+        
+        max_workers = max(1, min(config.BATCH_CONCURRENCY, len(items)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+    
     def get_token_usage(self) -> int:
         """Get token/request usage."""
         return self.service.get_token_usage()
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get completion cache hits, misses and size (empty when caching is off)."""
+        cache = getattr(self.service, "response_cache", None)
+        return cache.stats() if cache else {}
 
 
 # Singleton unified service instance
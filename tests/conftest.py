@@ -0,0 +1,15 @@
+"""Shared test setup: a throwaway database and an OpenAI provider that never hits the network."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Must be set before backend.config is imported
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="email_agent_tests_"), "email_agent.db")
+os.environ["LLM_PROVIDER"] = "openai"
+os.environ["OPENAI_API_KEY"] = "test-key"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+os.environ["LLM_SEMANTIC_CACHE_ENABLED"] = "false"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
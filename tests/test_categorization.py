@@ -0,0 +1,73 @@
+"""Categorization output must be a valid label before it is stored."""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from backend.database import Database
+from backend.email_processor import EmailProcessor
+from backend.llm_service import LLMService
+from backend.models import Email, Prompt
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+@pytest.fixture
+def llm():
+    service = LLMService()
+    service.structured_outputs = False
+    return service
+
+
+@pytest.fixture
+def processor(tmp_path, llm):
+    database = Database(str(tmp_path / "inbox.db"))
+    database.init_database()
+    database.insert_prompt(Prompt(id=None, prompt_type="categorization", prompt_text="Categorize: {email_content}"))
+    database.insert_prompt(Prompt(id=None, prompt_type="action_extraction", prompt_text="Extract: {email_content}"))
+    database.insert_email(Email(
+        id=1, sender="alice@example.com", subject="Lunch?", body="Are you free on Friday?",
+        timestamp=datetime(2024, 1, 1)
+    ))
+    
+    email_processor = EmailProcessor()
+    email_processor.db = database
+    email_processor.llm = llm
+    email_processor.rules = None
+    email_processor.classifier = None
+    email_processor._log_processing = lambda *args, **kwargs: None
+    yield email_processor
+    database.close()
+
+
+def test_categorize_rejects_free_text(llm, monkeypatch):
+    monkeypatch.setattr(llm.client.chat.completions, "create",
+                        lambda **kwargs: _completion("This looks like a personal message"))
+    assert llm.categorize_email("Hi", "Categorize: {email_content}") is None
+
+
+def test_categorize_structured_output_uses_enum(llm, monkeypatch):
+    requests = []
+    
+    def create(**kwargs):
+        requests.append(kwargs)
+        return _completion('{"category": "To-Do"}')
+    
+    llm.structured_outputs = True
+    monkeypatch.setattr(llm.client.chat.completions, "create", create)
+    assert llm.categorize_email("Hi", "Categorize: {email_content}") == "To-Do"
+    schema = requests[0]["response_format"]["json_schema"]["schema"]
+    assert schema["properties"]["category"]["enum"] == ["Important", "Newsletter", "Spam", "To-Do"]
+    assert "logit_bias" not in requests[0]
+
+
+def test_invalid_completion_never_reaches_database(processor, llm, monkeypatch):
+    monkeypatch.setattr(llm.client.chat.completions, "create",
+                        lambda **kwargs: _completion("Sure! Here is my analysis of the email."))
+    
+    assert processor.process_email(1) is False
+    email = processor.db.get_email(1)
+    assert email.category is None
+    assert not email.processed
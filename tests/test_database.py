@@ -0,0 +1,65 @@
+"""Database connection handling."""
+import threading
+from datetime import datetime
+
+from backend.database import Database
+from backend.models import Email
+
+
+def _email(email_id):
+    return Email(
+        id=email_id, sender="bob@example.com", subject=f"Report {email_id}",
+        body="Numbers attached.", timestamp=datetime(2024, 1, 1)
+    )
+
+
+def test_memory_database_accepts_concurrent_writers():
+    database = Database(":memory:")
+    database.init_database()
+    errors = []
+    
+    def write(first_id):
+        try:
+            for email_id in range(first_id, first_id + 50):
+                database.insert_email(_email(email_id))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=write, args=(first_id,)) for first_id in (1, 1001)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert len(database.get_all_emails(limit=1000)) == 100
+    database.close()
+
+
+def test_memory_database_survives_close():
+    database = Database(":memory:")
+    database.init_database()
+    database.insert_email(_email(1))
+    
+    database.close()
+    
+    assert database.get_email(1).subject == "Report 1"
+    database.close()
+
+
+def test_emails_version_changes_with_every_email_write(tmp_path):
+    database = Database(str(tmp_path / "inbox.db"))
+    database.init_database()
+    versions = [database.get_emails_version()]
+    
+    database.insert_email(_email(1))
+    versions.append(database.get_emails_version())
+    database.update_email(1, category="Important", processed=True)
+    versions.append(database.get_emails_version())
+    
+    # Another connection (e.g. another session's thread) sees the same version
+    other = Database(str(tmp_path / "inbox.db"))
+    assert other.get_emails_version() == versions[-1]
+    assert versions == sorted(set(versions))
+    database.close()
+    other.close()
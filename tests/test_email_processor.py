@@ -0,0 +1,53 @@
+"""Batch processing pipeline."""
+from datetime import datetime
+
+from backend.config import config
+from backend.database import Database
+from backend.email_processor import EmailProcessor
+from backend.models import Email, Prompt
+
+
+class CountingRules:
+    """Rule classifier stand-in that marks sender 'spam@...' as Spam and counts evaluations."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def classify(self, email):
+        self.calls += 1
+        return "Spam" if email.sender.startswith("spam@") else None
+
+
+class FakeLLM:
+    def categorize_emails_batch(self, email_contents, categorization_prompt, batch_size=None):
+        return ["Important"] * len(email_contents)
+    
+    def extract_action_items(self, email_content, action_prompt):
+        return []
+
+
+def test_batch_applies_rules_once_per_email(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_CATEGORIZATION_SIZE", 5)
+    database = Database(str(tmp_path / "inbox.db"))
+    database.init_database()
+    database.insert_prompt(Prompt(id=None, prompt_type="categorization", prompt_text="Categorize"))
+    database.insert_prompt(Prompt(id=None, prompt_type="action_extraction", prompt_text="Extract"))
+    senders = ["spam@example.com", "alice@example.com", "bob@example.com"]
+    for email_id, sender in enumerate(senders, start=1):
+        database.insert_email(Email(
+            id=email_id, sender=sender, subject="Hello", body="Body", timestamp=datetime(2024, 1, 1)
+        ))
+    
+    processor = EmailProcessor()
+    processor.db = database
+    processor.llm = FakeLLM()
+    processor.rules = CountingRules()
+    processor.classifier = None
+    processor._log_processing = lambda *args, **kwargs: None
+    
+    results = processor.batch_process_emails([1, 2, 3])
+    
+    assert results["successful"] == 3
+    assert processor.rules.calls == 3
+    assert [database.get_email(i).category for i in (1, 2, 3)] == ["Spam", "Important", "Important"]
+    database.close()
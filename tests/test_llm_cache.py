@@ -0,0 +1,36 @@
+"""Only validated completions are stored by cached_llm."""
+from backend.llm_cache import LLMResponseCache, cached_llm
+
+
+class FakeService:
+    model = "fake-model"
+    
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.response_cache = LLMResponseCache("fake", persist=False, semantic_enabled=False)
+    
+    @cached_llm
+    def _call_llm(self, messages, temperature=0.7, max_tokens=1000, stream=False):
+        self.calls += 1
+        return self.replies.pop(0)
+
+
+MESSAGES = [{"role": "user", "content": "Categorize this"}]
+
+
+def test_rejected_response_is_not_cached():
+    service = FakeService(["garbage", "Spam"])
+    
+    assert service._call_llm(MESSAGES, cache=True, validate=lambda text: text == "Spam") == "garbage"
+    assert service._call_llm(MESSAGES, cache=True, validate=lambda text: text == "Spam") == "Spam"
+    assert service._call_llm(MESSAGES, cache=True, validate=lambda text: text == "Spam") == "Spam"
+    assert service.calls == 2
+
+
+def test_uncached_calls_skip_the_cache():
+    service = FakeService(["one", "two"])
+    
+    assert service._call_llm(MESSAGES) == "one"
+    assert service._call_llm(MESSAGES) == "two"
+    assert service.response_cache.stats()["size"] == 0
@@ -0,0 +1,35 @@
+"""Requests sent to Ollama."""
+import json
+
+import httpx
+
+from backend.ollama_service import EMAIL_ANALYSIS_FORMAT, OllamaService
+
+
+def _service(payloads, content):
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json={"message": {"content": content}, "eval_count": 1})
+    
+    service = OllamaService()
+    service.response_cache = None
+    service._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return service
+
+
+def test_analysis_requests_the_email_analysis_schema():
+    payloads = []
+    service = _service(payloads, '{"category": "Spam", "action_items": []}')
+    service.structured_outputs = True
+    
+    assert service.analyze_email("Win a prize", "Categorize", "Extract") == {"category": "Spam", "action_items": []}
+    assert payloads[0]["format"] == EMAIL_ANALYSIS_FORMAT
+
+
+def test_analysis_falls_back_to_json_mode():
+    payloads = []
+    service = _service(payloads, '{"category": "Spam", "action_items": []}')
+    service.structured_outputs = False
+    
+    service.analyze_email("Win a prize", "Categorize", "Extract")
+    assert payloads[0]["format"] == "json"
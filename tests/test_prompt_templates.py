@@ -0,0 +1,22 @@
+"""Parsing of categorization replies."""
+import pytest
+
+from backend.prompt_templates import parse_category
+
+
+@pytest.mark.parametrize("response, expected", [
+    ("Spam", "Spam"),
+    ("Category: spam.", "Spam"),
+    ("To-Do:", "To-Do"),
+    ("todo", "To-Do"),
+    ("Newsletters", "Newsletter"),
+    ("ImportantNewsletter", "Important"),
+    ("  IMPORTANT  ", "Important"),
+])
+def test_parse_category_matches_labels(response, expected):
+    assert parse_category(response) == expected
+
+
+@pytest.mark.parametrize("response", [None, "", "   ", "Personal", "I am not sure what this is."])
+def test_parse_category_without_label_is_none(response):
+    assert parse_category(response) is None
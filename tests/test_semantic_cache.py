@@ -0,0 +1,27 @@
+"""Semantic response cache index."""
+from datetime import datetime, timedelta
+
+from backend.database import Database
+from backend.semantic_cache import SemanticCache
+
+
+def test_entries_survive_growth_eviction_and_reload(tmp_path):
+    database = Database(str(tmp_path / "cache.db"))
+    database.init_database()
+    cache = SemanticCache(database, threshold=0.95, ttl_seconds=3600)
+    
+    for i in range(40):
+        cache.store(f"what is the deadline for project {i} report", i, f"answer {i}")
+    
+    assert cache.lookup("what is the deadline for project 7 report", 7) == "answer 7"
+    assert cache.lookup("what is the deadline for project 7 report", 8) is None
+    
+    # Age out the first ten entries
+    cache._created_at[:10] = [datetime.utcnow() - timedelta(hours=2)] * 10
+    assert cache.lookup("what is the deadline for project 3 report", 3) is None
+    assert cache.lookup("what is the deadline for project 39 report", 39) == "answer 39"
+    assert cache._size == 30
+    
+    reloaded = SemanticCache(database, threshold=0.95, ttl_seconds=3600)
+    assert reloaded.lookup("what is the deadline for project 25 report", 25) == "answer 25"
+    database.close()
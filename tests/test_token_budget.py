@@ -0,0 +1,51 @@
+"""Token-budgeted history trimming."""
+from backend import token_budget
+from backend.token_budget import count_tokens, trim_history
+
+
+def _turns(count, words=50):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words}
+        for i in range(count)
+    ]
+
+
+def test_summary_is_pinned_and_charged_against_the_budget():
+    summary = {"role": "system", "content": "Earlier in this conversation: " + "detail " * 300}
+    history = [summary] + _turns(20)
+    budget = count_tokens(summary["content"]) + 3 * count_tokens(history[-1]["content"])
+    
+    trimmed = trim_history(history, budget, max_messages=10)
+    
+    assert trimmed[0] == summary
+    assert trimmed[1:] == history[-3:]
+    assert sum(count_tokens(m["content"]) for m in trimmed) <= budget
+
+
+def test_summary_counts_towards_the_message_cap():
+    summary = {"role": "system", "content": "Earlier in this conversation: short."}
+    history = [summary] + _turns(20, words=1)
+    
+    trimmed = trim_history(history, 10_000, max_messages=5)
+    
+    assert trimmed == [summary] + history[-4:]
+
+
+def test_oversized_summary_is_truncated_to_the_budget():
+    summary = {"role": "system", "content": "Earlier in this conversation: " + "detail " * 2000}
+    
+    trimmed = trim_history([summary] + _turns(4), 100)
+    
+    assert len(trimmed) == 1
+    assert trimmed[0]["role"] == "system"
+    assert count_tokens(trimmed[0]["content"]) < count_tokens(summary["content"])
+
+
+def test_missing_vocabulary_falls_back_to_estimate(monkeypatch, tmp_path):
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    token_budget._encoding.cache_clear()
+    try:
+        assert token_budget._encoding() is None
+        assert count_tokens("x" * 40) == 10
+    finally:
+        token_budget._encoding.cache_clear()
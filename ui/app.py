@@ -1,20 +1,67 @@
 """Main Streamlit application for Email Productivity Agent."""
 import streamlit as st
+import logging
 import sys
 from pathlib import Path
+from typing import Optional
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Configure logging once for the whole app
+logging.basicConfig(level=logging.INFO)
+
 from backend.config import config
-from backend.database import db
-from backend.email_processor import email_processor
-from backend.agent_logic import email_agent
-from ui.components.inbox_viewer import render_inbox_viewer, render_email_detail
+from backend.database import db, Database
+from ui.components.inbox_viewer import build_email_cards, render_inbox_viewer, render_email_detail
 from ui.components.prompt_editor import render_prompt_editor
 from ui.components.agent_chat import render_agent_chat
 from ui.components.draft_manager import render_draft_manager
+from ui.components.email_cache import get_email_cached
+
+
+# Emails fetched per inbox page ("Load more" fetches the next page by keyset cursor)
+INBOX_PAGE_SIZE = 50
+
+# Static page styling and footer, built once at import rather than on every rerun
+PAGE_CSS = """
+        <style>
+        .main-header {
+            padding: 1.5rem 0;
+            background: linear-gradient(90deg, rgba(99,102,241,0.1) 0%, rgba(168,85,247,0.1) 100%);
+            border-radius: 10px;
+            margin-bottom: 2rem;
+        }
+        .stButton > button {
+            border-radius: 8px;
+            transition: all 0.3s ease;
+        }
+        .stButton > button:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+        }
+        div[data-testid="stExpander"] {
+            border-radius: 8px;
+            border: 1px solid #e5e7eb;
+        }
+        </style>
+    """
 
+FOOTER_HTML = """
+        <div style='text-align: center; padding: 2rem 0 1rem 0; color: #6b7280;'>
+            <p style='margin: 0.5rem 0;'>
+                <strong>Important:</strong> All drafts are for review only - NOT sent automatically
+            </p>
+            <p style='margin: 0.5rem 0; font-size: 0.9rem;'>
+                Built using Streamlit • 
+                <strong>Model:</strong> {model} • 
+                <strong>Version:</strong> {version}
+            </p>
+        </div>
+    """.format(
+    model=config.OPENAI_MODEL if config.LLM_PROVIDER == 'openai' else config.OLLAMA_MODEL,
+    version=config.APP_VERSION
+)
 
 # Page configuration
 st.set_page_config(
@@ -25,6 +72,13 @@ st.set_page_config(
 )
 
 
+@st.cache_resource(show_spinner=False)
+def get_database() -> Database:
+    """Create the schema once per server process; every session shares the database."""
+    db.init_database()
+    return db
+
+
 def initialize_app():
     """Initialize application state and database."""
     # Validate configuration
@@ -36,7 +90,7 @@ def initialize_app():
     
     # Initialize database
     try:
-        db.init_database()
+        get_database()
     except Exception as e:
         st.error(f"Database initialization failed: {e}")
         st.stop()
@@ -51,27 +105,91 @@ def initialize_app():
         st.session_state.quick_action = None
         st.session_state.process_email_id = None
         st.session_state.process_batch = None
+        st.session_state.inbox_pages = 1
 
 
-def load_emails():
-    """Load emails from database or mock data."""
-    emails = db.get_all_emails()
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_email_page(version: int, page_cursor: Optional[tuple]) -> tuple:
+    """
+    Fetch one inbox page once per database emails version, so plain reruns skip the database.
+    
+    The version comes from db.get_emails_version(), which every write to the
+    emails table bumps, so entries shared between sessions never go stale.
+    """
+    return db.get_emails_page(page_cursor, INBOX_PAGE_SIZE)
+
+
+def _load_inbox_pages(version: int, pages: int) -> tuple:
+    """
+    Gather the first pages of the inbox, each served from the page cache.
+    
+    Returns:
+        Tuple of (emails, has_more)
+    """
+    emails = []
+    page_cursor = None
+    for _ in range(pages):
+        page, page_cursor = _load_email_page(version, page_cursor)
+        emails.extend(page)
+        if page_cursor is None:
+            break
+    return emails, page_cursor is not None
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _inbox_cards(version: int, pages: int) -> dict:
+    """Format the loaded pages' list entries once per emails version (ttl keeps relative times fresh)."""
+    return build_email_cards(_load_inbox_pages(version, pages)[0])
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def compute_inbox_stats(version: int) -> tuple:
+    """
+    Aggregate the whole inbox in SQL (not just the loaded pages).
+    
+    Returns:
+        Tuple of (total, processed_count, category_counts, total_actions, recent_processed_subjects),
+        category_counts largest first and recent subjects newest first
+    """
+    total = processed = actions = 0
+    categories = {}
+    for category, count, action_count, processed_count in db.get_inbox_stats():
+        total += count
+        processed += processed_count
+        actions += action_count
+        categories[category or "Uncategorized"] = count
+    return total, processed, categories, actions, db.get_recent_processed_subjects(5)
+
+
+def load_emails() -> tuple:
+    """
+    Load the visible inbox pages from database or mock data.
+    
+    Returns:
+        Tuple of (emails, has_more, emails_version), the version being the
+        database emails version the pages were loaded at
+    """
+    version = db.get_emails_version()
+    emails, has_more = _load_inbox_pages(version, st.session_state.inbox_pages)
     
     if not emails:
         # Load mock inbox
         with st.spinner("Loading mock inbox..."):
+            from backend.email_processor import email_processor
             count = email_processor.load_mock_inbox()
             if count > 0:
                 st.success(f"Loaded {count} emails from mock inbox")
-                emails = db.get_all_emails()
+                version = db.get_emails_version()
+                emails, has_more = _load_inbox_pages(version, st.session_state.inbox_pages)
             else:
                 st.warning("No emails found. Check if mock_inbox.json exists in data/ folder.")
     
-    return emails
+    return emails, has_more, version
 
 
 def process_email_action(email_id: int):
     """Process a single email."""
+    from backend.email_processor import email_processor
     with st.spinner(f"Processing email {email_id}..."):
         success = email_processor.process_email(email_id)
         if success:
@@ -86,18 +204,13 @@ def process_batch_emails(email_ids: list):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    results = {"total": len(email_ids), "successful": 0, "failed": 0}
+    def update_progress(completed: int, total: int):
+        status_text.text(f"Processed {completed}/{total} emails...")
+        progress_bar.progress(completed / total)
     
-    for i, email_id in enumerate(email_ids):
-        status_text.text(f"Processing email {i+1}/{len(email_ids)}...")
-        success = email_processor.process_email(email_id)
-        
-        if success:
-            results["successful"] += 1
-        else:
-            results["failed"] += 1
-        
-        progress_bar.progress((i + 1) / len(email_ids))
+    status_text.text(f"Processing {len(email_ids)} emails...")
+    from backend.email_processor import email_processor
+    results = email_processor.batch_process_emails(email_ids, progress_callback=update_progress)
     
     status_text.empty()
     progress_bar.empty()
@@ -112,28 +225,7 @@ def main():
     initialize_app()
     
     # Modern Header with gradient-like styling
-    st.markdown("""
-        <style>
-        .main-header {
-            padding: 1.5rem 0;
-            background: linear-gradient(90deg, rgba(99,102,241,0.1) 0%, rgba(168,85,247,0.1) 100%);
-            border-radius: 10px;
-            margin-bottom: 2rem;
-        }
-        .stButton > button {
-            border-radius: 8px;
-            transition: all 0.3s ease;
-        }
-        .stButton > button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-        }
-        div[data-testid="stExpander"] {
-            border-radius: 8px;
-            border: 1px solid #e5e7eb;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
     
     # Header
     col1, col2, col3 = st.columns([3, 2, 2])
@@ -168,6 +260,7 @@ def main():
         
         # Reload button at top
         if st.button("Reload Data", use_container_width=True, type="primary"):
+            # Email caches are keyed on the database's emails version, so a rerun sees every change
             st.rerun()
         
         st.divider()
@@ -180,18 +273,18 @@ def main():
         # System Stats - Modern Card Style
         st.markdown("### System Statistics")
         
-        emails = load_emails()
-        processed_count = sum(1 for e in emails if e.processed)
-        unprocessed_count = len(emails) - processed_count
+        emails, has_more, emails_version = load_emails()
+        total_count, processed_count, categories, total_actions, recent_processed = compute_inbox_stats(emails_version)
+        unprocessed_count = total_count - processed_count
         
         # Stats cards
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total", len(emails))
+            st.metric("Total", total_count)
             st.metric("Processed", processed_count)
         with col2:
             st.metric("Pending", unprocessed_count)
-            processing_rate = (processed_count / len(emails) * 100) if emails else 0
+            processing_rate = (processed_count / total_count * 100) if total_count else 0
             st.metric("Rate", f"{processing_rate:.0f}%")
         
         # Token usage (if available)
@@ -213,13 +306,18 @@ def main():
         # Left: Email List
         with col_left:
             with st.container():
-                render_inbox_viewer(emails, st.session_state.selected_email_id)
+                render_inbox_viewer(
+                    emails,
+                    st.session_state.selected_email_id,
+                    has_more,
+                    _inbox_cards(emails_version, st.session_state.inbox_pages)
+                )
         
         # Center: Email Detail
         with col_center:
             with st.container():
                 if st.session_state.selected_email_id:
-                    email = db.get_email(st.session_state.selected_email_id)
+                    email = get_email_cached(st.session_state.selected_email_id)
                     if email:
                         render_email_detail(email)
                     else:
@@ -235,21 +333,15 @@ def main():
                     st.markdown("### Inbox Insights")
                     
                     # Category breakdown with visual appeal
-                    categories = {}
-                    for email in emails:
-                        cat = email.category or "Uncategorized"
-                        categories[cat] = categories.get(cat, 0) + 1
-                    
                     if categories:
                         st.markdown("#### By Category")
-                        for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
-                            percentage = (count / len(emails) * 100) if emails else 0
+                        for cat, count in categories.items():
+                            percentage = (count / total_count * 100) if total_count else 0
                             st.progress(percentage / 100)
                             st.caption(f"**{cat}:** {count} emails ({percentage:.0f}%)")
                             st.markdown("")
                     
                     # Action items summary
-                    total_actions = sum(len(e.action_items) for e in emails)
                     st.divider()
                     st.markdown("#### Action Items")
                     st.metric("Total Tasks", total_actions)
@@ -257,10 +349,9 @@ def main():
                     # Recent activity
                     st.divider()
                     st.markdown("#### Recent Activity")
-                    recent_processed = [e for e in emails if e.processed][-5:]
                     if recent_processed:
-                        for email in reversed(recent_processed):
-                            st.caption(f"✓ {email.subject[:40]}...")
+                        for subject in recent_processed:
+                            st.caption(f"✓ {subject[:40]}...")
                     else:
                         st.caption("No processed emails yet")
         
@@ -306,21 +397,7 @@ def main():
     
     # Modern Footer
     st.divider()
-    st.markdown("""
-        <div style='text-align: center; padding: 2rem 0 1rem 0; color: #6b7280;'>
-            <p style='margin: 0.5rem 0;'>
-                <strong>Important:</strong> All drafts are for review only - NOT sent automatically
-            </p>
-            <p style='margin: 0.5rem 0; font-size: 0.9rem;'>
-                Built using Streamlit • 
-                <strong>Model:</strong> {model} • 
-                <strong>Version:</strong> {version}
-            </p>
-        </div>
-    """.format(
-        model=config.OPENAI_MODEL if config.LLM_PROVIDER == 'openai' else config.OLLAMA_MODEL,
-        version=config.APP_VERSION
-    ), unsafe_allow_html=True)
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
@@ -3,14 +3,18 @@ import streamlit as st
 from typing import Optional
 from datetime import datetime
 
-from backend.agent_logic import email_agent
+from backend.config import config
 from backend.models import AgentMessage
+from ui.components.email_cache import get_email_cached
 
 
+@st.fragment
 def render_agent_chat(selected_email_id: Optional[int] = None):
     """
     Render chat interface with the email agent.
     
+    Runs as a fragment: typing and chat buttons rerun only this panel.
+    
     Args:
         selected_email_id: Currently selected email for context
     """
@@ -19,11 +23,15 @@ def render_agent_chat(selected_email_id: Optional[int] = None):
     # Initialize chat history in session state
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    if "chat_export" not in st.session_state:
+        st.session_state.chat_export = ""
+    if "chat_summary" not in st.session_state:
+        st.session_state.chat_summary = None
+        st.session_state.chat_summarized_upto = 0
     
     # Context indicator with modern styling
     if selected_email_id:
-        from backend.database import db
-        email = db.get_email(selected_email_id)
+        email = get_email_cached(selected_email_id)
         if email:
             st.success(f"**Context:** {email.subject[:50]}...")
     else:
@@ -93,59 +101,13 @@ def render_agent_chat(selected_email_id: Optional[int] = None):
         query = st.session_state.pending_query
         st.session_state.pending_query = None
         
-        # Add user message
-        user_msg = AgentMessage(
-            role="user",
-            content=query,
-            timestamp=datetime.utcnow()
-        )
-        st.session_state.chat_history.append(user_msg)
-        
-        # Get agent response
-        with st.spinner("Thinking..."):
-            response = email_agent.handle_query(
-                user_query=query,
-                selected_email_id=selected_email_id,
-                conversation_history=st.session_state.chat_history[:-1]
-            )
-        
-        # Add assistant message
-        assistant_msg = AgentMessage(
-            role="assistant",
-            content=response,
-            timestamp=datetime.utcnow()
-        )
-        st.session_state.chat_history.append(assistant_msg)
-        st.rerun()
+        _respond(query, selected_email_id, chat_container)
     
     # Chat input
     user_input = st.chat_input("Ask about your emails...", key="chat_input")
     
     if user_input:
-        # Add user message
-        user_msg = AgentMessage(
-            role="user",
-            content=user_input,
-            timestamp=datetime.utcnow()
-        )
-        st.session_state.chat_history.append(user_msg)
-        
-        # Get agent response
-        with st.spinner("Thinking..."):
-            response = email_agent.handle_query(
-                user_query=user_input,
-                selected_email_id=selected_email_id,
-                conversation_history=st.session_state.chat_history[:-1]
-            )
-        
-        # Add assistant message
-        assistant_msg = AgentMessage(
-            role="assistant",
-            content=response,
-            timestamp=datetime.utcnow()
-        )
-        st.session_state.chat_history.append(assistant_msg)
-        st.rerun()
+        _respond(user_input, selected_email_id, chat_container)
     
     # Chat management buttons
     st.divider()
@@ -153,17 +115,16 @@ def render_agent_chat(selected_email_id: Optional[int] = None):
     with col1:
         if st.button("🗑️ Clear Chat", key="clear_chat", use_container_width=True, type="secondary"):
             st.session_state.chat_history = []
+            st.session_state.chat_export = ""
+            st.session_state.chat_summary = None
+            st.session_state.chat_summarized_upto = 0
             st.rerun()
     
     with col2:
         if st.session_state.chat_history:
-            chat_text = "\n\n".join([
-                f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}"
-                for msg in st.session_state.chat_history
-            ])
             st.download_button(
                 "Export",
-                chat_text,
+                st.session_state.chat_export,
                 file_name=f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                 mime="text/plain",
                 key="download_chat",
@@ -171,3 +132,70 @@ def render_agent_chat(selected_email_id: Optional[int] = None):
             )
         else:
             st.button("Export", key="export_disabled", use_container_width=True, disabled=True)
+
+
+def _append_message(msg: AgentMessage):
+    """Add a message to the chat history and to the prebuilt export text."""
+    st.session_state.chat_history.append(msg)
+    line = f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}"
+    export = st.session_state.chat_export
+    st.session_state.chat_export = f"{export}\n\n{line}" if export else line
+
+
+def _respond(query: str, selected_email_id: Optional[int], chat_container):
+    """
+    Add a user message to the chat and stream the agent's reply into it.
+    
+    Args:
+        query: User's message
+        selected_email_id: Currently selected email for context
+        chat_container: Container holding the conversation
+    """
+    # Add user message
+    user_msg = AgentMessage(
+        role="user",
+        content=query,
+        timestamp=datetime.utcnow()
+    )
+    _append_message(user_msg)
+    
+    # Imported on first use: the agent pulls in the embedding model and LLM clients
+    from backend.agent_logic import email_agent
+    
+    # Stream agent response as it is generated
+    with chat_container:
+        with st.chat_message("user", avatar="👤"):
+            st.markdown(query)
+        with st.chat_message("assistant", avatar="🤖"):
+            response = st.write_stream(email_agent.handle_query_stream(
+                user_query=query,
+                selected_email_id=selected_email_id,
+                # Only the turns the LLM sees, not a copy of the whole (unbounded) chat
+                conversation_history=st.session_state.chat_history[-(config.MAX_CONVERSATION_HISTORY + 1):-1],
+                conversation_summary=st.session_state.chat_summary
+            ))
+    
+    # Add assistant message
+    assistant_msg = AgentMessage(
+        role="assistant",
+        content=response,
+        timestamp=datetime.utcnow()
+    )
+    _append_message(assistant_msg)
+    
+    # Fold every message that has left the history window into the running summary,
+    # so no turn is ever outside both the summary and the window
+    if config.CONVERSATION_SUMMARY_ENABLED:
+        history = st.session_state.chat_history
+        # With a summary present, it takes one slot of the agent's history window
+        window_start = len(history) - (config.MAX_CONVERSATION_HISTORY - 1)
+        summarized_upto = st.session_state.chat_summarized_upto
+        if window_start > summarized_upto:
+            summary = email_agent.summarize_conversation(
+                history[summarized_upto:window_start], st.session_state.chat_summary
+            )
+            if summary:
+                st.session_state.chat_summary = summary
+                st.session_state.chat_summarized_upto = window_start
+    
+    st.rerun()
@@ -1,17 +1,20 @@
 """Draft manager component for Streamlit UI."""
+import pandas as pd
 import streamlit as st
 from datetime import datetime
 from typing import Optional
 
 from backend.database import db
-from backend.agent_logic import email_agent
 from backend.models import Draft
 
 
+@st.fragment
 def render_draft_manager(selected_email_id: Optional[int] = None):
     """
     Render draft email manager.
     
+    Runs as a fragment: selecting or editing a draft reruns only this panel.
+    
     Args:
         selected_email_id: Currently selected email ID
     """
@@ -30,27 +33,31 @@ def render_draft_manager(selected_email_id: Optional[int] = None):
     
     st.divider()
     
-    # Generate new draft button
+    # Generate new draft form (typing instructions doesn't rerun anything until submitted)
     if selected_email_id:
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            user_instruction = st.text_input(
-                "Custom instructions (optional)",
-                placeholder="e.g., 'Be more formal' or 'Ask for more details'",
-                key="draft_instruction"
-            )
-        with col2:
-            if st.button("Generate Draft", key="generate_draft", use_container_width=True):
-                with st.spinner("Generating draft..."):
-                    draft = email_agent.generate_draft(
-                        email_id=selected_email_id,
-                        user_instruction=user_instruction if user_instruction else None
-                    )
-                    if draft:
-                        st.success("✓ Draft created!")
-                        st.rerun()
-                    else:
-                        st.error("❌ Failed to generate draft")
+        with st.form("new_draft", clear_on_submit=True, border=False):
+            col1, col2 = st.columns([2, 1], vertical_alignment="bottom")
+            with col1:
+                user_instruction = st.text_input(
+                    "Custom instructions (optional)",
+                    placeholder="e.g., 'Be more formal' or 'Ask for more details'",
+                    key="draft_instruction"
+                )
+            with col2:
+                submitted = st.form_submit_button("Generate Draft", use_container_width=True)
+        
+        if submitted:
+            from backend.agent_logic import email_agent
+            with st.spinner("Generating draft..."):
+                draft = email_agent.generate_draft(
+                    email_id=selected_email_id,
+                    user_instruction=user_instruction if user_instruction else None
+                )
+                if draft:
+                    st.success("✓ Draft created!")
+                    st.rerun()
+                else:
+                    st.error("❌ Failed to generate draft")
         
         st.divider()
     
@@ -58,89 +65,126 @@ def render_draft_manager(selected_email_id: Optional[int] = None):
     if not drafts:
         st.info("📭 No drafts yet. Generate a draft for an email to get started!")
     else:
-        for draft in drafts:
-            with st.expander(f"📄 Draft #{draft.id} - {draft.subject}", expanded=len(drafts) == 1):
-                # Draft metadata
-                st.caption(f"**Created:** {draft.created_at.strftime('%Y-%m-%d %H:%M')}")
-                
-                if draft.metadata.get("original_sender"):
-                    st.caption(f"**Original Email From:** {draft.metadata['original_sender']}")
-                
-                if draft.metadata.get("user_instruction"):
-                    st.caption(f"**Custom Instructions:** {draft.metadata['user_instruction']}")
-                
-                st.divider()
-                
-                # Editable subject
-                edited_subject = st.text_input(
-                    "Subject",
-                    value=draft.subject,
-                    key=f"draft_subject_{draft.id}"
+        # One lightweight grid row per draft; edit widgets are built only for the selected one.
+        # Row indexes only mean something for one list of drafts, so a new key (and a
+        # cleared selection) is used whenever drafts are added, regenerated or deleted
+        listed_ids = tuple(draft.id for draft in drafts)
+        selection = st.dataframe(
+            pd.DataFrame([
+                {
+                    "ID": draft.id,
+                    "Subject": draft.subject,
+                    "Original Sender": draft.metadata.get("original_sender", ""),
+                    "Created": draft.created_at.strftime('%Y-%m-%d %H:%M')
+                }
+                for draft in drafts
+            ]),
+            hide_index=True,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key=f"drafts_table_{hash(listed_ids)}"
+        )
+        
+        if selection.selection.rows:
+            _render_draft_editor(drafts[selection.selection.rows[0]])
+        elif len(drafts) == 1:
+            _render_draft_editor(drafts[0])
+        else:
+            st.caption("Select a draft to view and edit it")
+
+
+def _render_draft_editor(draft: Draft):
+    """
+    Render the editable view of one draft.
+    
+    Args:
+        draft: Draft to display
+    """
+    st.markdown(f"#### 📄 Draft #{draft.id} - {draft.subject}")
+    
+    # Draft metadata
+    st.caption(f"**Created:** {draft.created_at.strftime('%Y-%m-%d %H:%M')}")
+    
+    if draft.metadata.get("original_sender"):
+        st.caption(f"**Original Email From:** {draft.metadata['original_sender']}")
+    
+    if draft.metadata.get("user_instruction"):
+        st.caption(f"**Custom Instructions:** {draft.metadata['user_instruction']}")
+    
+    st.divider()
+    
+    # Editable subject
+    edited_subject = st.text_input(
+        "Subject",
+        value=draft.subject,
+        key=f"draft_subject_{draft.id}"
+    )
+    
+    # Editable body
+    edited_body = st.text_area(
+        "Body",
+        value=draft.body,
+        height=250,
+        key=f"draft_body_{draft.id}"
+    )
+    
+    # Action buttons
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        if st.button("📋 Copy", key=f"copy_{draft.id}", use_container_width=True):
+            # Note: Actual clipboard copy requires additional library
+            st.info("💡 Copy the text manually from the text area above")
+    
+    with col2:
+        if st.button("🔄 Regenerate", key=f"regen_{draft.id}", use_container_width=True):
+            from backend.agent_logic import email_agent
+            with st.spinner("✍️ Regenerating..."):
+                new_draft = email_agent.generate_draft(
+                    email_id=draft.email_id,
+                    user_instruction="Rewrite the previous draft with a different approach"
                 )
-                
-                # Editable body
-                edited_body = st.text_area(
-                    "Body",
-                    value=draft.body,
-                    height=250,
-                    key=f"draft_body_{draft.id}"
+                if new_draft:
+                    st.success("✓ New draft created!")
+                    st.rerun()
+    
+    with col3:
+        # Download draft button
+        draft_content = f"Subject: {edited_subject}\n\n{edited_body}"
+        st.download_button(
+            "💾 Download",
+            draft_content,
+            file_name=f"draft_{draft.id}_{datetime.now().strftime('%Y%m%d')}.txt",
+            mime="text/plain",
+            key=f"download_{draft.id}",
+            use_container_width=True
+        )
+    
+    with col4:
+        if st.button("🗑️ Delete", key=f"delete_{draft.id}", use_container_width=True, type="secondary"):
+            db.delete_draft(draft.id)
+            st.success("✓ Draft deleted")
+            st.rerun()
+    
+    st.divider()
+    
+    # Original email reference
+    if draft.email_id:
+        with st.expander("📧 View Original Email"):
+            original_email = db.get_email(draft.email_id)
+            if original_email:
+                st.markdown(f"**From:** {original_email.sender}")
+                st.markdown(f"**Subject:** {original_email.subject}")
+                st.markdown(f"**Body:**")
+                st.text_area(
+                    "Original",
+                    value=original_email.body,
+                    height=150,
+                    disabled=True,
+                    key=f"original_{draft.id}",
+                    label_visibility="collapsed"
                 )
-                
-                # Action buttons
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    if st.button("📋 Copy", key=f"copy_{draft.id}", use_container_width=True):
-                        # Note: Actual clipboard copy requires additional library
-                        st.info("💡 Copy the text manually from the text area above")
-                
-                with col2:
-                    if st.button("🔄 Regenerate", key=f"regen_{draft.id}", use_container_width=True):
-                        with st.spinner("✍️ Regenerating..."):
-                            new_draft = email_agent.generate_draft(
-                                email_id=draft.email_id,
-                                user_instruction="Rewrite the previous draft with a different approach"
-                            )
-                            if new_draft:
-                                st.success("✓ New draft created!")
-                                st.rerun()
-                
-                with col3:
-                    # Download draft button
-                    draft_content = f"Subject: {edited_subject}\n\n{edited_body}"
-                    st.download_button(
-                        "💾 Download",
-                        draft_content,
-                        file_name=f"draft_{draft.id}_{datetime.now().strftime('%Y%m%d')}.txt",
-                        mime="text/plain",
-                        key=f"download_{draft.id}",
-                        use_container_width=True
-                    )
-                
-                with col4:
-                    if st.button("🗑️ Delete", key=f"delete_{draft.id}", use_container_width=True, type="secondary"):
-                        db.delete_draft(draft.id)
-                        st.success("✓ Draft deleted")
-                        st.rerun()
-                
-                st.divider()
-                
-                # Original email reference
-                if draft.email_id:
-                    with st.expander("📧 View Original Email"):
-                        original_email = db.get_email(draft.email_id)
-                        if original_email:
-                            st.markdown(f"**From:** {original_email.sender}")
-                            st.markdown(f"**Subject:** {original_email.subject}")
-                            st.markdown(f"**Body:**")
-                            st.text_area(
-                                "Original",
-                                value=original_email.body,
-                                height=150,
-                                disabled=True,
-                                key=f"original_{draft.id}",
-                                label_visibility="collapsed"
-                            )
 
 
 def render_draft_history():
@@ -0,0 +1,29 @@
+"""Cached email lookups shared by UI components."""
+import streamlit as st
+from typing import Optional
+
+from backend.database import db
+from backend.models import Email
+
+
+@st.cache_data(ttl=30, max_entries=128, show_spinner=False)
+def _get_email(email_id: int, version: int) -> Optional[Email]:
+    """Fetch an email once per database emails version."""
+    return db.get_email(email_id)
+
+
+def get_email_cached(email_id: int) -> Optional[Email]:
+    """
+    Get an email, reusing the copy fetched earlier in this or a previous rerun.
+    
+    The cache is keyed on the database's emails version, which every write
+    to the emails table bumps, so sessions sharing the cache never see a
+    stale copy.
+    
+    Args:
+        email_id: Email ID
+        
+    Returns:
+        Email object or None if not found
+    """
+    return _get_email(email_id, db.get_emails_version())
@@ -1,56 +1,172 @@
 """Inbox viewer component for Streamlit UI."""
-import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Optional
+import streamlit as st
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, List, NamedTuple, Optional
 
 from backend.models import Email
 
 
-def get_relative_time(timestamp: datetime) -> str:
-    """Convert timestamp to relative time string."""
-    if isinstance(timestamp, str):
-        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-    
-    now = datetime.now(timestamp.tzinfo) if timestamp.tzinfo else datetime.utcnow()
-    diff = now - timestamp
-    
-    if diff < timedelta(minutes=1):
+class EmailCard(NamedTuple):
+    """Precomputed display values for one inbox table row (plus its search text)."""
+    status: str
+    subject: str
+    sender: str
+    category: str
+    received: str
+    tasks: int
+    search_text: str
+
+
+# Inbox table columns, in EmailCard field order
+INBOX_COLUMNS = ["", "Subject", "From", "Category", "Received", "Tasks"]
+
+
+_MINUTES_PER_HOUR = 60
+_MINUTES_PER_DAY = 24 * _MINUTES_PER_HOUR
+_MINUTES_PER_WEEK = 7 * _MINUTES_PER_DAY
+
+
+@lru_cache(maxsize=4096)
+def _format_relative_time(age_minutes: int, day: date) -> str:
+    """Format an age in whole minutes (day is only shown for ages of a week or more)."""
+    if age_minutes < 1:
         return "Just now"
-    elif diff < timedelta(hours=1):
-        mins = int(diff.total_seconds() / 60)
-        return f"{mins} minute{'s' if mins != 1 else ''} ago"
-    elif diff < timedelta(days=1):
-        hours = int(diff.total_seconds() / 3600)
+    elif age_minutes < _MINUTES_PER_HOUR:
+        return f"{age_minutes} minute{'s' if age_minutes != 1 else ''} ago"
+    elif age_minutes < _MINUTES_PER_DAY:
+        hours = age_minutes // _MINUTES_PER_HOUR
         return f"{hours} hour{'s' if hours != 1 else ''} ago"
-    elif diff < timedelta(days=7):
-        days = diff.days
+    elif age_minutes < _MINUTES_PER_WEEK:
+        days = age_minutes // _MINUTES_PER_DAY
         return f"{days} day{'s' if days != 1 else ''} ago"
     else:
-        return timestamp.strftime("%b %d, %Y")
+        return day.strftime("%b %d, %Y")
+
+
+def get_relative_time(timestamp: datetime, now: Optional[datetime] = None) -> str:
+    """
+    Convert timestamp to relative time string.
+    
+    Args:
+        timestamp: When the email was received (naive timestamps are UTC)
+        now: Current UTC time, so a caller formatting many timestamps can read
+            the clock once (read here if omitted)
+    
+    Returns:
+        Relative time label, or the date for anything a week or older
+    """
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    
+    if now is None:
+        now = datetime.now(timezone.utc)
+    if timestamp.tzinfo is None:
+        now = now.replace(tzinfo=None)
+    age_minutes = int((now - timestamp).total_seconds() // 60)
+    return _format_relative_time(age_minutes, timestamp.date())
+
+
+_PRIORITY_EMOJI = {
+    "high": "🔴",
+    "medium": "🟡",
+    "low": "🟢"
+}
+
+# Message body box in the detail view ({body} is the body with <br> line breaks)
+MESSAGE_BODY_HTML = """
+    <div style='
+        background-color: rgba(240, 242, 246, 0.5);
+        padding: 1.5rem;
+        border-radius: 8px;
+        border-left: 4px solid #6366f1;
+        max-height: 400px;
+        overflow-y: auto;
+    '>
+        {body}
+    </div>
+"""
+
+# Inbox status options: wanted processed flag (None = any)
+STATUS_FILTERS = {
+    "All": None,
+    "Processed": True,
+    "Unprocessed": False,
+}
+
+# Inbox sort options: (key function, reverse)
+SORT_KEYS = {
+    "Date (Newest)": (attrgetter("timestamp"), True),
+    "Date (Oldest)": (attrgetter("timestamp"), False),
+    "Sender": (attrgetter("sender"), False),
+    "Category": (lambda e: e.category or "zzz", False),
+}
+
+
+_CATEGORY_BADGES = {
+    "Important": "🔴 Important",
+    "To-Do": "🟠 To-Do",
+    "Newsletter": "🔵 Newsletter",
+    "Spam": "⚫ Spam",
+    None: "🔘 Uncategorized",
+    "": "🔘 Uncategorized"
+}
 
 
 def get_category_badge(category: Optional[str]) -> str:
     """Get colored badge HTML for category."""
-    if not category:
-        return "🔘 Uncategorized"
+    return _CATEGORY_BADGES.get(category) or f"🔘 {category}"
+
+
+def build_email_cards(emails: List[Email]) -> Dict[int, EmailCard]:
+    """
+    Format the inbox table rows for emails.
     
-    badges = {
-        "Important": "🔴 Important",
-        "To-Do": "🟠 To-Do",
-        "Newsletter": "🔵 Newsletter",
-        "Spam": "⚫ Spam"
-    }
-    return badges.get(category, f"🔘 {category}")
+    Callers cache the result per inbox version, so reruns (including every
+    keystroke in the search box) reuse the values instead of re-formatting
+    timestamps and re-lowercasing bodies per email.
+    
+    Args:
+        emails: Emails to format
+        
+    Returns:
+        Mapping of email ID to its card
+    """
+    cards = {}
+    now = datetime.now(timezone.utc)
+    for email in emails:
+        cards[email.id] = EmailCard(
+            status="✓" if email.processed else "•",
+            subject=email.subject,
+            sender=email.sender,
+            category=get_category_badge(email.category),
+            received=get_relative_time(email.timestamp, now),
+            tasks=len(email.action_items),
+            search_text=f"{email.subject}\x00{email.sender}\x00{email.body}".lower()
+        )
+    return cards
 
 
-def render_inbox_viewer(emails: list[Email], selected_email_id: Optional[int] = None):
+@st.fragment
+def render_inbox_viewer(
+    emails: list[Email],
+    selected_email_id: Optional[int] = None,
+    has_more: bool = False,
+    cards: Optional[Dict[int, EmailCard]] = None
+):
     """
     Render email inbox viewer with filtering and search.
     
+    Runs as a fragment: searching and filtering rerun only the list; actions
+    that change the rest of the page trigger a full rerun.
+    
     Args:
         emails: List of Email objects to display
         selected_email_id: Currently selected email ID
+        has_more: Whether older emails exist beyond the loaded pages
+        cards: Precomputed list entries by email ID (built here if omitted)
     """
     st.markdown("### Inbox")
     
@@ -67,95 +183,72 @@ def render_inbox_viewer(emails: list[Email], selected_email_id: Optional[int] =
         col1, col2 = st.columns(2)
         
         with col1:
-            categories = ["All"] + sorted(list(set(e.category for e in emails if e.category)))
+            categories = ["All", *sorted({e.category for e in emails if e.category})]
             selected_category = st.selectbox("Category", categories, key="category_filter")
         
         with col2:
-            status_filter = st.selectbox("Status", ["All", "Processed", "Unprocessed"], key="status_filter")
+            status_filter = st.selectbox("Status", list(STATUS_FILTERS), key="status_filter")
         
         # Sort options in same expander
-        sort_by = st.selectbox("Sort by", ["Date (Newest)", "Date (Oldest)", "Sender", "Category"], key="sort_by")
-    
-    # Filter emails
-    filtered_emails = emails
-    
-    if search_query:
-        filtered_emails = [
-            e for e in filtered_emails
-            if search_query.lower() in e.subject.lower()
-            or search_query.lower() in e.sender.lower()
-            or search_query.lower() in e.body.lower()
-        ]
-    
-    if selected_category != "All":
-        filtered_emails = [e for e in filtered_emails if e.category == selected_category]
+        sort_by = st.selectbox("Sort by", list(SORT_KEYS), key="sort_by")
     
-    if status_filter == "Processed":
-        filtered_emails = [e for e in filtered_emails if e.processed]
-    elif status_filter == "Unprocessed":
-        filtered_emails = [e for e in filtered_emails if not e.processed]
+    # Cards are cached separately from the emails, so fill in any they miss
+    missing = [e for e in emails if cards is None or e.id not in cards]
+    if missing:
+        cards = {**(cards or {}), **build_email_cards(missing)}
     
-    # Sort emails
-    if sort_by == "Date (Newest)":
-        filtered_emails.sort(key=lambda x: x.timestamp, reverse=True)
-    elif sort_by == "Date (Oldest)":
-        filtered_emails.sort(key=lambda x: x.timestamp)
-    elif sort_by == "Sender":
-        filtered_emails.sort(key=lambda x: x.sender)
-    elif sort_by == "Category":
-        filtered_emails.sort(key=lambda x: x.category or "zzz")
+    # Filter and sort emails in a single pass (no filter pass at all when none is set)
+    query = search_query.lower()
+    want_processed = STATUS_FILTERS[status_filter]
+    if query or selected_category != "All" or want_processed is not None:
+        matches = (
+            e for e in emails
+            if (not query or query in cards[e.id].search_text)
+            and (selected_category == "All" or e.category == selected_category)
+            and (want_processed is None or e.processed == want_processed)
+        )
+    else:
+        matches = emails
+    sort_key, reverse = SORT_KEYS[sort_by]
+    filtered_emails = sorted(matches, key=sort_key, reverse=reverse)
     
     # Display count and bulk actions
     col1, col2 = st.columns([2, 1])
     with col1:
         st.caption(f"Showing **{len(filtered_emails)}** of **{len(emails)}** emails")
     with col2:
-        if filtered_emails:
-            unprocessed = [e for e in filtered_emails if not e.processed]
-            if unprocessed and st.button("Process All", key="process_all_btn", use_container_width=True):
-                st.session_state.process_batch = [e.id for e in unprocessed]
+        if any(not e.processed for e in filtered_emails):
+            if st.button("Process All", key="process_all_btn", use_container_width=True):
+                st.session_state.process_batch = [e.id for e in filtered_emails if not e.processed]
+                st.rerun()
     
     st.divider()
     
-    # Email list with modern card design
+    # Email list as one selectable table instead of a widget per email
     if not filtered_emails:
         st.info("No emails match your filters. Try adjusting your search criteria.")
     else:
-        # Container for scrollable email list
-        for email in filtered_emails:
-            # Email card with better styling
-            is_selected = email.id == selected_email_id
-            
-            # Create a more compact, modern email card
-            with st.container():
-                # Main button for email selection
-                status_indicator = "✓" if email.processed else "•"
-                button_label = f"{status_indicator} {email.subject[:45]}..."
-                
-                if st.button(
-                    button_label,
-                    key=f"email_{email.id}",
-                    use_container_width=True,
-                    type="primary" if is_selected else "secondary",
-                    help=f"From: {email.sender}"
-                ):
-                    st.session_state.selected_email_id = email.id
-                    st.rerun()
-                
-                # Metadata row
-                col1, col2, col3 = st.columns([2, 2, 1])
-                with col1:
-                    st.caption(f"From: {email.sender[:30]}")
-                with col2:
-                    st.caption(get_category_badge(email.category))
-                with col3:
-                    st.caption(get_relative_time(email.timestamp))
-                
-                # Action items indicator
-                if email.action_items and len(email.action_items) > 0:
-                    st.caption(f"{len(email.action_items)} task{'s' if len(email.action_items) > 1 else ''}")
-                
-                st.markdown("<br>", unsafe_allow_html=True)
+        # Row indexes only mean something for one row order, so a new key
+        # (and a cleared selection) is used whenever the listed emails change
+        listed_ids = tuple(e.id for e in filtered_emails)
+        selection = st.dataframe(
+            pd.DataFrame([cards[email_id][:-1] for email_id in listed_ids], columns=INBOX_COLUMNS),
+            hide_index=True,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key=f"inbox_table_{hash(listed_ids)}"
+        )
+        
+        if selection.selection.rows:
+            email_id = listed_ids[selection.selection.rows[0]]
+            if email_id != selected_email_id:
+                st.session_state.selected_email_id = email_id
+                st.rerun()
+    
+    if has_more and st.button("Load more emails", key="load_more_emails", use_container_width=True):
+        st.session_state.inbox_pages += 1
+        st.rerun()
 
 
 def render_email_detail(email: Email):
@@ -173,14 +266,10 @@ def render_email_detail(email: Email):
     with st.container():
         st.markdown(f"## {email.subject}")
         
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.markdown(f"**From:** {email.sender}")
-            st.caption(f"Received: {get_relative_time(email.timestamp)}")
-        with col2:
-            if email.category:
-                st.markdown("**Category:**")
-                st.markdown(get_category_badge(email.category))
+        # Metadata as two plain rows rather than a column layout
+        st.markdown(f"**From:** {email.sender}")
+        received = f"Received: {get_relative_time(email.timestamp)}"
+        st.caption(f"{received} · {get_category_badge(email.category)}" if email.category else received)
     
     # Action button
     if not email.processed:
@@ -196,18 +285,7 @@ def render_email_detail(email: Email):
     st.markdown("### Message")
     with st.container():
         # Use a box for better visual separation
-        st.markdown(f"""
-            <div style='
-                background-color: rgba(240, 242, 246, 0.5);
-                padding: 1.5rem;
-                border-radius: 8px;
-                border-left: 4px solid #6366f1;
-                max-height: 400px;
-                overflow-y: auto;
-            '>
-                {email.body.replace(chr(10), '<br>')}
-            </div>
-        """, unsafe_allow_html=True)
+        st.markdown(MESSAGE_BODY_HTML.format(body=email.body.replace("\n", "<br>")), unsafe_allow_html=True)
     
     # Action items with modern design
     if email.action_items and len(email.action_items) > 0:
@@ -222,24 +300,20 @@ def render_email_detail(email: Email):
                     st.markdown(f"**Task:** {item}")
             elif isinstance(item, dict):
                 # If item is a dict, use the normal structure
-                task_title = item.get('task', 'Unknown')[:45]
-                with st.expander(f"**Task {i}:** {task_title}...", expanded=i==1):
-                    st.markdown(f"**Task:** {item.get('task', 'Unknown')}")
+                task = item.get('task', 'Unknown')
+                deadline = item.get('deadline')
+                priority = item.get('priority')
+                with st.expander(f"**Task {i}:** {task[:45]}...", expanded=i==1):
+                    st.markdown(f"**Task:** {task}")
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if item.get('deadline'):
-                            st.markdown(f"**Deadline:** {item.get('deadline')}")
+                        if deadline:
+                            st.markdown(f"**Deadline:** {deadline}")
                     with col2:
-                        if item.get('priority'):
-                            priority = item.get('priority', '').lower()
-                            priority_emoji = {
-                                'high': '🔴',
-                                'medium': '🟡',
-                                'low': '🟢'
-                            }.get(priority, '⚪')
-                            priority_label = item.get('priority').title()
-                            st.markdown(f"**Priority:** {priority_emoji} {priority_label}")
+                        if priority:
+                            priority_emoji = _PRIORITY_EMOJI.get(priority.lower(), '⚪')
+                            st.markdown(f"**Priority:** {priority_emoji} {priority.title()}")
             else:
                 # Fallback for unexpected types
                 with st.expander(f"**Task {i}:** [Invalid format]", expanded=False):